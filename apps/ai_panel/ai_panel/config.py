@@ -25,6 +25,10 @@ AUDIO_RATE_PLAYBACK = 24000 # AI 播放采样率
 AUDIO_RATE_RECORDING = 16000 # AI 录音采样率
 AUDIO_CHANNELS = 1
 AUDIO_FORMAT = 8  # paInt16 (PyAudio常量)
+AUDIO_MAX_RECORD_SECONDS = 30 # 单次录音最长时长，超出部分丢弃
+AUDIO_TRIM_SILENCE = True # 上传前裁掉录音首尾的静音段
+AUDIO_SILENCE_PEAK = 500 # 100ms 块内峰值低于此值视为静音 (int16)
+AUDIO_SILENCE_RMS = 200 # 整段录音均方根低于此值时不发送给 AI
 
 # === Qwen API ===
 QWEN_MODEL = "qwen3-omni-flash-realtime"
@@ -44,4 +48,3 @@ DESKTOP_STREAM_TCP_PORT = 5655
 DESKTOP_STREAM_ZMQ_PORT = 5555
 DESKTOP_STREAM_PUB_KEY_PATH = "server_public.key"
 DESKTOP_STREAM_TARGET_FPS = 60
-DESKTOP_STREAM_BUFFER_SIZE = 2
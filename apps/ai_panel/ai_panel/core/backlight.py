@@ -2,35 +2,42 @@
 """背光管理 - 精准计时器控制"""
 import os
 import sys
+import math
 import atexit
 import signal
 import logging
-from PyQt6.QtCore import QTimer, QObject
+from PyQt6.QtCore import QTimer, QObject, QVariantAnimation
 
 logger = logging.getLogger(__name__)
 
 # 从 config 导入常量
 from config import BACKLIGHT_PATH, BRIGHTNESS_START, BRIGHTNESS_MIN, BRIGHTNESS_EXIT, BRIGHTNESS_DIM_TIME, BRIGHTNESS_DIM_STEP
 
-BRIGHTNESS_STEPS = BRIGHTNESS_START - BRIGHTNESS_MIN
+BRIGHTNESS_HW_MAX = 19  # 背光驱动支持的最大档位
 
 class BacklightManager(QObject):
+    # 各档位预先编码为 bytes，写入时无需再格式化
+    _BRIGHTNESS_BYTES = tuple(str(i).encode() for i in range(BRIGHTNESS_HW_MAX + 1))
+
     def __init__(self):
         super().__init__()
         self.brightness = BRIGHTNESS_START
-        self.dim_step = 0
         # 60秒无操作计时器
         self.idle_timer = QTimer(self)
         self.idle_timer.setSingleShot(True)
         self.idle_timer.timeout.connect(self.start_dimming)
-        # 渐暗计时器 (每x秒降1级)
-        self.dim_timer = QTimer(self)
-        self.dim_timer.setInterval(int(BRIGHTNESS_DIM_STEP * 1000))
-        self.dim_timer.timeout.connect(self.dim_step_down)
+        # 渐暗动画 (每x秒降1级)，由动画插值亮度，档位变化时才写入
+        self.dim_anim = QVariantAnimation(self)
+        self.dim_anim.setEndValue(float(BRIGHTNESS_MIN))
+        self.dim_anim.valueChanged.connect(self._on_dim_value)
 
         # Flag to indicate external requests to keep screen on
         self._keep_screen_on_requested = False
 
+        # sysfs 背光文件保持打开，每次调节只需一次 pwrite
+        self._bl_fd = None
+        atexit.register(self._close_backlight_fd)
+
         # 初始化背光
         self.set_brightness(BRIGHTNESS_START)
         self.reset_idle_timer()
@@ -41,8 +48,7 @@ class BacklightManager(QObject):
             self.idle_timer.stop()
             self.idle_timer.start(int(BRIGHTNESS_DIM_TIME * 1000))
             # 停止渐暗
-            self.dim_timer.stop()
-            self.dim_step = 0
+            self.dim_anim.stop()
             # 恢复亮度
             if self.brightness != BRIGHTNESS_START:
                 self.set_brightness(BRIGHTNESS_START)
@@ -53,8 +59,7 @@ class BacklightManager(QObject):
         logger.info("Screen-on request received.")
         self._keep_screen_on_requested = True
         self.idle_timer.stop()
-        self.dim_timer.stop()
-        self.dim_step = 0
+        self.dim_anim.stop()
         if self.brightness != BRIGHTNESS_START:
             self.set_brightness(BRIGHTNESS_START)
             self.brightness = BRIGHTNESS_START
@@ -67,38 +72,45 @@ class BacklightManager(QObject):
 
     def set_brightness(self, value: int) -> bool:
         try:
-            val = max(1, min(19, int(value)))
-            with open(BACKLIGHT_PATH, 'w') as f:
-                f.write(str(val))
+            val = int(value)
+            val = 1 if val < 1 else BRIGHTNESS_HW_MAX if val > BRIGHTNESS_HW_MAX else val
+            if self._bl_fd is None:
+                self._bl_fd = os.open(BACKLIGHT_PATH, os.O_WRONLY)
+            os.pwrite(self._bl_fd, self._BRIGHTNESS_BYTES[val], 0)
             self.brightness = val
             return True
         except Exception as e:
             logger.error(f"Error setting backlight: {e}")
             return False
 
+    def _close_backlight_fd(self):
+        if self._bl_fd is not None:
+            try:
+                os.close(self._bl_fd)
+            except OSError:
+                pass
+            self._bl_fd = None
+
     def start_dimming(self):
         """开始渐暗过程"""
         if self._keep_screen_on_requested:
             return
         if self.brightness <= BRIGHTNESS_MIN:
             return
-        self.dim_step = 0
-        if self._keep_screen_on_requested: # Double-check before starting timer
-            return
-        self.dim_timer.start()
+        self.dim_anim.stop()
+        self.dim_anim.setStartValue(float(self.brightness))
+        self.dim_anim.setDuration(int((self.brightness - BRIGHTNESS_MIN) * BRIGHTNESS_DIM_STEP * 1000))
+        self.dim_anim.start()
 
-    def dim_step_down(self):
-        """每x秒降低一级亮度"""
+    def _on_dim_value(self, value):
+        """动画插值回调，亮度档位变化时写入"""
         if self._keep_screen_on_requested:
+            self.dim_anim.stop()
             return
-        if self.dim_step >= BRIGHTNESS_STEPS:
-            self.dim_timer.stop()
-            return
-        self.brightness -= 1
-        self.set_brightness(self.brightness)
-        self.dim_step += 1
-        if self.brightness <= BRIGHTNESS_MIN:
-            self.dim_timer.stop()
+        # 向上取整：每满一个步长才降一级，与逐级计时一致
+        level = math.ceil(value)
+        if level != self.brightness:
+            self.set_brightness(level)
 
 # --- 退出保障 ---
 def restore_exit_brightness():
@@ -1,11 +1,10 @@
 # core/input_handler.py
 """输入处理器 - 处理GPIO按键输入"""
 import evdev
-import asyncio
-from evdev import categorize, ecodes
-from PyQt6.QtCore import QObject, pyqtSignal
+import os
+from evdev.ecodes import EV_KEY, KEY_UP as CODE_UP, KEY_DOWN as CODE_DOWN, KEY_ENTER as CODE_ENTER
+from PyQt6.QtCore import QObject, QSocketNotifier, pyqtSignal
 import logging
-import threading
 import time
 
 logger = logging.getLogger(__name__)
@@ -16,6 +15,17 @@ class InputHandler(QObject):
     KEY_DOWN = "down"
     KEY_ENTER = "enter"
 
+    # 按键码到自定义名称的查找表，按键码直接作为下标
+    _KEY_NAME_TABLE = [None] * (max(CODE_UP, CODE_DOWN, CODE_ENTER) + 1)
+    _KEY_NAME_TABLE[CODE_UP] = KEY_UP
+    _KEY_NAME_TABLE[CODE_DOWN] = KEY_DOWN
+    _KEY_NAME_TABLE[CODE_ENTER] = KEY_ENTER
+    # Add more mappings as needed (grow the table size above accordingly)
+    _KEY_NAME_TABLE = tuple(_KEY_NAME_TABLE)
+
+    # 同一按键在该时间窗口内的重复按下将被丢弃（秒）
+    KEY_DEBOUNCE_SECONDS = 0.05
+
     # PyQt信号，用于在主线程中处理按键事件
     key_pressed = pyqtSignal(str)
 
@@ -23,8 +33,8 @@ class InputHandler(QObject):
         super().__init__()
         self.device_path = device_path
         self.device = None
-        self.running = False  # Add a flag to control the loop
-        self.read_thread = None # Keep track of the reading thread
+        self._notifier = None # Watches the device fd from the Qt event loop
+        self._last_key = (None, 0.0) # (key_name, monotonic time) of the last emitted key
         self._initialize_device()
 
     def _initialize_device(self):
@@ -33,10 +43,10 @@ class InputHandler(QObject):
             self.device = evdev.InputDevice(self.device_path)
             logger.info(f"Grabbed input device: {self.device.name}")
             self.device.grab()  # Grab the device to prevent other apps from receiving events
-            self.running = True # Set running flag to True
-            # Start the reading loop in a separate thread
-            self.read_thread = threading.Thread(target=self._read_loop, daemon=True)
-            self.read_thread.start()
+            # Let the Qt main loop watch the fd instead of a dedicated read thread
+            os.set_blocking(self.device.fd, False)
+            self._notifier = QSocketNotifier(self.device.fd, QSocketNotifier.Type.Read, self)
+            self._notifier.activated.connect(self._on_readable)
         except FileNotFoundError:
             logger.error(f"Input device not found: {self.device_path}")
             raise
@@ -47,57 +57,53 @@ class InputHandler(QObject):
             logger.error(f"Failed to initialize input device: {e}")
             raise
 
-    def _read_loop(self):
-        """在单独线程中持续读取按键事件"""
-        logger.debug(f"_read_loop thread {threading.current_thread().ident} started.")
-        while self.running: # Use the running flag to control the loop
-            try:
-                # Use async iterator to handle potential interruption
-                # However, evdev.read_loop() is blocking. We need to handle interruption differently.
-                # Since we can't interrupt a blocking read easily, we'll use the running flag
-                # and catch the OSError when device is closed externally.
-                for event in self.device.read_loop():
-                    if not self.running: # Check flag frequently inside the loop
-                        break
-                    if event.type == ecodes.EV_KEY and event.value == 1:  # Key pressed
-                        key_name = self._map_keycode(event.code)
-                        if key_name:
-                            logger.debug(f"Key pressed: {key_name}")
-                            # Emit the signal to the main thread
-                            self.key_pressed.emit(key_name)
-            except OSError as e:
-                # This catches the "Bad file descriptor" error when the device is closed
-                if e.errno == 9: # errno 9 is EBADF (Bad file descriptor)
-                    logger.debug("Input device closed, exiting read loop.")
-                    break
-                else:
-                    logger.error(f"Error reading from input device: {e}")
-                    break # Break on other errors too
-            except Exception as e:
-                logger.error(f"Unexpected error in input read loop: {e}")
-                break # Break on unexpected errors
+    def _on_readable(self):
+        """设备可读时在主线程中读取所有排队的按键事件"""
+        if self.device is None:
+            return # Already released, a queued activation may still arrive
+        try:
+            # read() drains every event currently queued in one syscall
+            events = list(self.device.read())
+        except BlockingIOError:
+            return # Spurious wakeup, nothing queued
+        except OSError as e:
+            logger.error(f"Error reading from input device: {e}")
+            self._notifier.setEnabled(False)
+            return
 
-        logger.debug(f"_read_loop thread {threading.current_thread().ident} finished.")
+        # Collect mapped presses from this batch, dropping debounced duplicates.
+        # value == 1 is a press; autorepeat (2) and release (0) are ignored on purpose.
+        ev_key = EV_KEY
+        key_table = self._KEY_NAME_TABLE
+        table_size = len(key_table)
+        last_name, last_time = self._last_key
+        pressed = []
+        for event in events:
+            if event.type == ev_key and event.value == 1:  # Key pressed
+                key_name = key_table[event.code] if event.code < table_size else None
+                if not key_name:
+                    continue
+                now = time.monotonic()
+                if key_name == last_name and now - last_time < self.KEY_DEBOUNCE_SECONDS:
+                    continue
+                last_name, last_time = key_name, now
+                pressed.append(key_name)
+        self._last_key = (last_name, last_time)
 
-    def _map_keycode(self, keycode):
-        """映射按键码到自定义名称"""
-        key_map = {
-            ecodes.KEY_UP: self.KEY_UP,
-            ecodes.KEY_DOWN: self.KEY_DOWN,
-            ecodes.KEY_ENTER: self.KEY_ENTER,
-            # Add more mappings as needed
-        }
-        return key_map.get(keycode)
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        for key_name in pressed:
+            if debug_enabled:
+                logger.debug("Key pressed: %s", key_name)
+            # Already on the main thread, slots are invoked directly
+            self.key_pressed.emit(key_name)
 
     def release(self):
         """释放输入设备"""
         logger.info("Releasing input device.")
-        self.running = False # Set the flag to stop the loop
-        if self.read_thread:
-            # Wait for the thread to finish gracefully
-            self.read_thread.join(timeout=2.0) # Give it some time to stop
-            if self.read_thread.is_alive():
-                logger.warning("Input read thread did not stop in time.")
+        if self._notifier:
+            self._notifier.setEnabled(False) # Stop watching before the fd is closed
+            self._notifier.deleteLater()
+            self._notifier = None
         if self.device:
             try:
                 self.device.ungrab()  # Ungrab the device
@@ -1,24 +1,31 @@
 # core/state_manager.py
 import threading
+import queue
 import logging
 import time
 import subprocess
+from functools import partial
+import numpy as np
 from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import Qt
 from core.input_handler import InputHandler
 from ui.main_window import MainWindow
 from services.ai_service import AIService
 from services.audio_record_service import AudioRecordService
 from services.audio_play_service import AudioPlayService
+from config import AUDIO_SILENCE_RMS
 
 logger = logging.getLogger(__name__)
 
 class StateManager:
-    STATE_MONITOR = "monitor"
-    STATE_AI_IDLE = "ai_idle"
-    STATE_AI_LISTENING = "ai_listening"
-    STATE_AI_PROCESSING = "ai_processing"
-    STATE_AI_PLAYING = "ai_playing"
-    STATE_DESKTOP = "desktop"
+    STATE_MONITOR = 0
+    STATE_AI_IDLE = 1
+    STATE_AI_LISTENING = 2
+    STATE_AI_PROCESSING = 3
+    STATE_AI_PLAYING = 4
+    STATE_DESKTOP = 5
+    # 状态名称，仅用于日志输出
+    STATE_NAMES = ("monitor", "ai_idle", "ai_listening", "ai_processing", "ai_playing", "desktop")
 
     def __init__(self, main_window: MainWindow, input_handler: InputHandler):
         self.window = main_window
@@ -29,21 +36,53 @@ class StateManager:
         self.audio_record_service = AudioRecordService()
         self._current_ai_response_text = ""
         self._last_logged_user_transcript = ""
-        self.input_handler.key_pressed.connect(self._on_key_pressed)
+        # 按键分发表：上下键与状态无关，其余按 (状态, 按键) 查找
+        self._global_key_handlers = {
+            InputHandler.KEY_DOWN: lambda: self._switch_panel(direction=1),
+            InputHandler.KEY_UP: lambda: self._switch_panel(direction=-1),
+        }
+        self._key_handlers = {
+            (self.STATE_MONITOR, InputHandler.KEY_ENTER): self._show_monitor_menu,
+            (self.STATE_AI_IDLE, InputHandler.KEY_ENTER): self._start_recording,
+            (self.STATE_AI_LISTENING, InputHandler.KEY_ENTER): self._stop_recording,
+        }
+        # InputHandler emits from the main thread (QSocketNotifier), so call the slot directly
+        self.input_handler.key_pressed.connect(self._on_key_pressed, Qt.ConnectionType.DirectConnection)
         self.backlight_manager = None
         self.current_state = self.STATE_MONITOR
         self.target_panel_id = MainWindow.PANEL_MONITOR
         self.shutdown_event = threading.Event()
-        self.recording_thread = None
-        self.ai_connect_thread = None
+        # 会话编号：每次开始录音或切换面板时递增，后台任务只在编号未变时才修改状态
+        self._session = 0
+        self._stopped_session = None
+        self._state_lock = threading.Lock()
+        # 录音与等待回复各用一个常驻后台线程，新的录音不会排在上一轮回复之后；None 为退出标记
+        self._jobs = queue.Queue()
+        self._worker = threading.Thread(target=self._job_loop, args=(self._jobs,), daemon=True)
+        self._worker.start()
+        self._response_jobs = queue.Queue()
+        self._response_worker = threading.Thread(target=self._job_loop, args=(self._response_jobs,), daemon=True)
+        self._response_worker.start()
         if self.window:
             self.window.switch_to_panel(self.target_panel_id)
 
     def set_backlight_manager(self, backlight_manager):
         self.backlight_manager = backlight_manager
 
+    def _job_loop(self, jobs):
+        logger.debug("_job_loop thread %s started.", threading.current_thread().ident)
+        while not self.shutdown_event.is_set():
+            job = jobs.get()
+            if job is None:
+                break
+            try:
+                job()
+            except Exception as e:
+                logger.error("Error in background job %s: %s", getattr(job, 'func', job), e)
+        logger.debug("_job_loop thread %s finished.", threading.current_thread().ident)
+
     def _on_key_pressed(self, key_name):
-        logger.debug(f"State {self.current_state}, received key: {key_name}")
+        logger.debug("State %s, received key: %s", self.STATE_NAMES[self.current_state], key_name)
         # Check if Monitor Panel has focus and menu is open
         if (self.current_state == self.STATE_MONITOR and
             self.window and
@@ -54,16 +93,12 @@ class StateManager:
                 return # Event was handled by the menu, do not process further
 
         # Process keys only if menu is not open or if the current state is not monitor
-        if key_name == InputHandler.KEY_DOWN:
-            self._switch_panel(direction=1)
-        elif key_name == InputHandler.KEY_UP:
-            self._switch_panel(direction=-1)
-        elif self.current_state == self.STATE_MONITOR and key_name == InputHandler.KEY_ENTER:
-            self.window.monitor_panel.show_menu()
-        elif self.current_state == self.STATE_AI_IDLE and key_name == InputHandler.KEY_ENTER:
-            self._start_recording()
-        elif self.current_state == self.STATE_AI_LISTENING and key_name == InputHandler.KEY_ENTER:
-            self._stop_recording()
+        handler = self._global_key_handlers.get(key_name) or self._key_handlers.get((self.current_state, key_name))
+        if handler:
+            handler()
+
+    def _show_monitor_menu(self):
+        self.window.monitor_panel.show_menu()
 
     def request_app_exit(self):
         """Request application exit for systemd restart."""
@@ -100,23 +135,23 @@ class StateManager:
         else:
             new_state = self.STATE_MONITOR
 
-        old_state = self.current_state
-        self.current_state = new_state
-        self.target_panel_id = new_panel_id
-        logger.info(f"Panel switch executed. Old State: {old_state}, New State: {new_state}, Target Panel ID: {new_panel_id}")
+        with self._state_lock:
+            self._session += 1 # 未完成的录音/回复任务不再改动新面板的状态
+            old_state = self.current_state
+            self.current_state = new_state
+            self.target_panel_id = new_panel_id
+        logger.info("Panel switch executed. Old State: %s, New State: %s, Target Panel ID: %s", self.STATE_NAMES[old_state], self.STATE_NAMES[new_state], new_panel_id)
         self.window.switch_to_panel(new_panel_id)
 
         if new_panel_id == MainWindow.PANEL_AI:
             logger.info("Switched to AI panel, initiating AI service connection...")
-            self.ai_connect_thread = threading.Thread(target=self._connect_ai_service, daemon=True)
-            self.ai_connect_thread.start()
+            self._connect_ai_service()
         else:
-            logger.info(f"Switched to panel {new_panel_id}, resetting AI panel status...")
+            logger.info("Switched to panel %s, resetting AI panel status...", new_panel_id)
             self.window.ai_panel.set_emoticon(self.window.ai_panel.EMO_SWITCHING)
             self.window.ai_panel.stop_speaking_animation()
 
     def _connect_ai_service(self):
-        logger.info(f"_connect_ai_service thread {threading.current_thread().ident} started.")
         logger.info("AI service ready for on-demand connection. Setting callbacks.")
         self.ai_service.set_callbacks(
             user_transcript_cb=self._on_user_transcript,
@@ -124,94 +159,126 @@ class StateManager:
             audio_play_started_cb=self._on_audio_play_started,
             response_done_cb=self._on_response_done_api_side
         )
-        logger.info(f"_connect_ai_service thread {threading.current_thread().ident} finished setting callbacks.")
 
     def _start_recording(self):
-        if self.current_state != self.STATE_AI_IDLE:
-            logger.warning(f"Cannot start recording in state: {self.current_state}")
-            return
-        logger.info("Starting recording sequence.")
-        self.current_state = self.STATE_AI_LISTENING
+        with self._state_lock:
+            if self.current_state != self.STATE_AI_IDLE:
+                logger.warning("Cannot start recording in state: %s", self.STATE_NAMES[self.current_state])
+                return
+            logger.info("Starting recording sequence.")
+            self._session += 1
+            session = self._session
+            self.current_state = self.STATE_AI_LISTENING
         self.window.ai_panel.set_status(self.window.ai_panel.STATUS_LISTENING)
         self.window.ai_panel.set_emoticon(self.window.ai_panel.EMO_LISTENING)
-        self.recording_thread = threading.Thread(target=self._recording_worker, daemon=True)
-        self.recording_thread.start()
+        self._jobs.put(partial(self._recording_worker, session))
 
     def _stop_recording(self):
         if self.current_state != self.STATE_AI_LISTENING:
-            logger.warning(f"Cannot stop recording in state: {self.current_state}")
+            logger.warning("Cannot stop recording in state: %s", self.STATE_NAMES[self.current_state])
+            return
+        if self._stopped_session == self._session:
+            # 本次录音已请求停止，重复按键不能留下一个会让下次录音立即结束的停止信号
+            logger.debug("Stop already requested for this recording, ignoring.")
             return
         logger.info("Stopping recording and preparing to send.")
+        self._stopped_session = self._session
         self.audio_record_service.stop_recording()
 
     def _stop_recording_immediate(self):
         logger.info("Immediately stopping recording.")
-        self.audio_record_service.stop_recording()
-        if self.current_state == self.STATE_AI_LISTENING:
+        with self._state_lock:
+            if self._stopped_session != self._session:
+                self._stopped_session = self._session
+                self.audio_record_service.stop_recording()
+            if self.current_state == self.STATE_AI_LISTENING:
+                self.current_state = self.STATE_AI_IDLE
+                self.window.ai_panel.set_status(self.window.ai_panel.STATUS_IDLE)
+                self.window.ai_panel.set_emoticon(self.window.ai_panel.EMO_IDLE)
+
+    def _finish_session(self, session, expected_states, status=None, emoticon=None):
+        """后台任务结束时回到空闲状态；会话已被新的录音或面板切换取代时不做任何改动"""
+        with self._state_lock:
+            if session != self._session:
+                logger.info("Session %s superseded by %s, leaving state unchanged.", session, self._session)
+                return False
+            if self.current_state not in expected_states:
+                return False
+            if self.current_state == self.STATE_AI_PLAYING:
+                self.window.ai_panel.stop_speaking_animation()
             self.current_state = self.STATE_AI_IDLE
-            self.window.ai_panel.set_status(self.window.ai_panel.STATUS_IDLE)
-            self.window.ai_panel.set_emoticon(self.window.ai_panel.EMO_IDLE)
+            self.window.ai_panel.set_status(status or self.window.ai_panel.STATUS_IDLE)
+            self.window.ai_panel.set_emoticon(emoticon or self.window.ai_panel.EMO_IDLE)
+            return True
 
-    def _recording_worker(self):
-        logger.info(f"_recording_worker thread {threading.current_thread().ident} started.")
+    def _recording_worker(self, session):
+        logger.info("_recording_worker thread %s started.", threading.current_thread().ident)
         if self.shutdown_event.is_set():
             logger.info("Shutdown event set before recording started, exiting worker.")
             return
 
+        active_states = (self.STATE_AI_LISTENING, self.STATE_AI_PROCESSING, self.STATE_AI_PLAYING)
         try:
+            # 会话已被取代时停止信号已经发出，这里会立即返回并消费掉它
             audio_data = self.audio_record_service.start_recording()
-            logger.info(f"_recording_worker thread {threading.current_thread().ident} finished recording, got {len(audio_data)} bytes.")
+            if self.shutdown_event.is_set():
+                logger.info("Shutdown requested during recording, discarding audio.")
+                return
+            logger.info("_recording_worker thread %s finished recording, got %s bytes.", threading.current_thread().ident, audio_data.nbytes)
+            if session != self._session:
+                logger.info("Recording belongs to superseded session %s, discarding audio.", session)
+                return
 
-            if audio_data:
-                logger.info(f"_recording_worker thread {threading.current_thread().ident} sending audio to AI...")
-                if self.current_state == self.STATE_AI_LISTENING:
+            if audio_data.nbytes and self._audio_rms(audio_data) < AUDIO_SILENCE_RMS:
+                logger.info("Recording is silence, skipping send.")
+            elif audio_data.nbytes:
+                logger.info("_recording_worker thread %s sending audio to AI...", threading.current_thread().ident)
+                with self._state_lock:
+                    if session != self._session or self.current_state != self.STATE_AI_LISTENING:
+                        return
                     self.current_state = self.STATE_AI_PROCESSING
                     self.window.ai_panel.set_status(self.window.ai_panel.STATUS_PROCESSING)
                     self.window.ai_panel.set_emoticon(self.window.ai_panel.EMO_THINKING)
-                    logger.info(f"_recording_worker thread {threading.current_thread().ident} calling ai_service.send_audio.")
-                    if self.ai_service.send_audio(audio_data):
-                        logger.info(f"_recording_worker thread {threading.current_thread().ident} ai_service.send_audio returned True.")
-                        success = self.ai_service.wait_for_response(timeout=30)
-                        if not success:
-                            logger.warning("Timeout waiting for AI response or audio playback to finish.")
-                        if self.current_state in [self.STATE_AI_PROCESSING, self.STATE_AI_PLAYING]:
-                            self.window.ai_panel.set_status("Response/Playback Timeout")
-                        if self.current_state == self.STATE_AI_PLAYING:
-                            self.window.ai_panel.stop_speaking_animation()
-                        self.window.ai_panel.set_emoticon(self.window.ai_panel.EMO_IDLE)
-                        self.current_state = self.STATE_AI_IDLE
-                    else:
-                        logger.error("Failed to send audio to AI service (likely connection issue).")
-                        if self.current_state in [self.STATE_AI_PROCESSING, self.STATE_AI_PLAYING]:
-                            self.window.ai_panel.stop_speaking_animation()
-                            self.window.ai_panel.set_status("Send Error - Ready")
-                        self.window.ai_panel.set_emoticon(self.window.ai_panel.EMO_IDLE)
-                        self.current_state = self.STATE_AI_IDLE
+                logger.info("_recording_worker thread %s calling ai_service.send_audio.", threading.current_thread().ident)
+                if self.ai_service.send_audio(audio_data):
+                    logger.info("_recording_worker thread %s ai_service.send_audio returned True.", threading.current_thread().ident)
+                    # 等待回复交给另一个线程，录音线程立即可以开始下一次录音
+                    self._response_jobs.put(partial(self._response_worker, session))
+                    return
+                logger.error("Failed to send audio to AI service (likely connection issue).")
+                self._finish_session(session, active_states, status="Send Error - Ready")
+                return
             else:
                 logger.info("Recording finished but no data captured.")
 
-            if self.current_state == self.STATE_AI_LISTENING:
-                self.window.ai_panel.set_status(self.window.ai_panel.STATUS_IDLE)
-                self.window.ai_panel.set_emoticon(self.window.ai_panel.EMO_IDLE)
+        except Exception as e:
+            logger.error("Error in recording worker: %s", e)
+            self._finish_session(session, active_states, status="Error", emoticon=self.window.ai_panel.EMO_ERROR)
+            return
+
+        self._finish_session(session, active_states)
 
+    def _response_worker(self, session):
+        """等待 AI 回复及播放结束后回到空闲状态"""
+        status = None
+        try:
+            if not self.ai_service.wait_for_response(timeout=30):
+                logger.warning("Timeout waiting for AI response or audio playback to finish.")
+                status = "Response/Playback Timeout"
         except Exception as e:
-            logger.error(f"Error in recording worker: {e}")
-            if self.current_state in [self.STATE_AI_LISTENING, self.STATE_AI_PROCESSING, self.STATE_AI_PLAYING]:
-                self.window.ai_panel.stop_speaking_animation()
-                self.window.ai_panel.set_status("Error")
-                self.window.ai_panel.set_emoticon(self.window.ai_panel.EMO_ERROR)
-            self.current_state = self.STATE_AI_IDLE
+            logger.error("Error waiting for AI response: %s", e)
+            status = "Error"
+        self._finish_session(session, (self.STATE_AI_PROCESSING, self.STATE_AI_PLAYING), status=status)
 
-        finally:
-            if self.current_state in [self.STATE_AI_LISTENING, self.STATE_AI_PROCESSING, self.STATE_AI_PLAYING]:
-                self.current_state = self.STATE_AI_IDLE
-                self.window.ai_panel.set_status(self.window.ai_panel.STATUS_IDLE)
-                self.window.ai_panel.set_emoticon(self.window.ai_panel.EMO_IDLE)
-                self.window.ai_panel.stop_speaking_animation()
+    @staticmethod
+    def _audio_rms(audio_data):
+        """计算 int16 PCM 的均方根幅度，使用 int32 避免平方溢出"""
+        samples = np.frombuffer(audio_data, dtype=np.int16).astype(np.int32)
+        return float(np.sqrt(np.mean(samples * samples)))
 
     def _on_user_transcript(self, text):
         if text != self._last_logged_user_transcript:
-            logger.info(f"User said: {text}")
+            logger.info("User said: %s", text)
             self._last_logged_user_transcript = text
 
     def _on_ai_text(self, delta_text):
@@ -219,7 +286,7 @@ class StateManager:
 
     def _on_audio_play_started(self):
         logger.info("Audio playback started signal received from AI Service.")
-        if self.current_state in [self.STATE_AI_PROCESSING]:
+        if self.current_state == self.STATE_AI_PROCESSING:
             logger.info("Transitioning to playing state and starting animation.")
             self.current_state = self.STATE_AI_PLAYING
             self.window.ai_panel.set_status(self.window.ai_panel.STATUS_PLAYING)
@@ -234,11 +301,15 @@ class StateManager:
         if self.current_state == self.STATE_AI_LISTENING:
             logger.info("Cleaning up: Stopping recording if active.")
             self._stop_recording_immediate()
-        if self.recording_thread and self.recording_thread.is_alive():
-            logger.info("Waiting for recording thread to finish...")
-            self.recording_thread.join(timeout=2.0)
-        if self.recording_thread and self.recording_thread.is_alive():
-            logger.warning("Recording thread did not finish in time.")
+        # Wake the workers if they are idle on their queues
+        self._jobs.put(None)
+        self._response_jobs.put(None)
+        for worker in (self._worker, self._response_worker):
+            if worker.is_alive() and worker is not threading.current_thread():
+                logger.info("Waiting for background worker to finish...")
+                worker.join(timeout=2.0)
+            if worker.is_alive():
+                logger.warning("Background worker did not finish in time.")
         logger.info("Cleaning up: Releasing audio recording resources.")
         self.audio_record_service.release_resources()
         logger.info("Cleaning up: Disconnecting AI service.")
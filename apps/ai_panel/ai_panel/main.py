@@ -4,6 +4,7 @@ import os
 import signal
 import logging
 from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import Qt
 from logger_config import setup_logger
 
 setup_logger()
@@ -41,7 +42,7 @@ def main():
     state_manager.window = window
     state_manager.set_backlight_manager(backlight)
     state_manager.window.switch_to_panel(state_manager.target_panel_id)
-    input_handler.key_pressed.connect(backlight.reset_idle_timer)
+    input_handler.key_pressed.connect(backlight.reset_idle_timer, Qt.ConnectionType.DirectConnection)
 
     logger.info("Application started.")
     try:
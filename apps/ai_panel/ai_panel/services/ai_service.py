@@ -29,12 +29,14 @@ class AICallback(OmniRealtimeCallback):
 
 class AIService:
     CONNECTION_TIMEOUT_SECONDS = 55
+    ENCODED_CHUNK_CHARS = 4264 # 对应 3198 字节原始 PCM（3 与 2 的公倍数，不拆分采样）
     def __init__(self, audio_play_service_instance):
         self.conversation = None
         self.callback_instance = AICallback(self)
         self.connected = False
         self.connection_lock = threading.Lock()
         self.response_done_event = threading.Event()
+        self._connected_event = threading.Event() # on_open 回调时置位
         self.session_id = None
         self.last_activity_timestamp = 0
         self.context_messages = []
@@ -43,6 +45,14 @@ class AIService:
         self.on_ai_text_callback = None
         self.on_audio_play_started_callback = None
         self.on_response_done_callback = None
+        # 事件类型 -> 处理方法，一次字典查找代替逐个字符串比较
+        self._event_dispatch = {
+            'session.created': self._on_session_created,
+            'conversation.item.input_audio_transcription.completed': self._on_user_transcript,
+            'response.audio_transcript.delta': self._on_ai_text,
+            'response.audio.delta': self._on_audio_delta,
+            'response.done': self._on_response_done,
+        }
 
     def ensure_connection(self):
         with self.connection_lock:
@@ -61,11 +71,9 @@ class AIService:
         try:
             dashscope.api_key = QWEN_API_KEY
             self.conversation = OmniRealtimeConversation(model=QWEN_MODEL, callback=self.callback_instance, url=QWEN_URL)
+            self._connected_event.clear()
             self.conversation.connect()
-            start_time = time.time()
-            timeout = 10
-            while not self.connected and (time.time() - start_time) < timeout: time.sleep(0.1)
-            if not self.connected:
+            if not self._connected_event.wait(timeout=10) or not self.connected:
                 logger.error("[AI Service] Connection timed out or failed to establish after SDK call.")
                 return False
             self._configure_session()
@@ -91,6 +99,7 @@ class AIService:
         else:
             logger.debug("[AI Service] Attempted to disconnect, but no conversation object exists.")
         self.connected = False
+        self._connected_event.clear()
         self.session_id = None
         self.last_activity_timestamp = 0
         self.response_done_event.clear()
@@ -109,6 +118,7 @@ class AIService:
             )
 
     def send_audio(self, audio_bytes):
+        """发送整段录音，audio_bytes 可为 bytes 或任意支持缓冲区协议的对象（如 memoryview）"""
         if not self.ensure_connection():
             logger.error("[AI Service] Cannot send audio, failed to ensure connection.")
             self.connected = False
@@ -120,12 +130,14 @@ class AIService:
                 return False
             self.response_done_event.clear()
             self.audio_play_service.playback_finished_event.clear()
-            chunk_size = 3200
             try:
-                for i in range(0, len(audio_bytes), chunk_size):
-                    chunk = audio_bytes[i:i+chunk_size]
-                    encoded_chunk = base64.b64encode(chunk).decode('ascii')
-                    self.conversation.append_audio(encoded_chunk)
+                # 整段一次编码后按编码串切片；切片长度须为 4 的倍数以保证每段可独立解码
+                # memoryview 切片不复制，每段直接从编码缓冲区解码为 str，不再生成整段 str
+                encoded = memoryview(base64.b64encode(audio_bytes))
+                append_audio = self.conversation.append_audio
+                step = self.ENCODED_CHUNK_CHARS
+                for i in range(0, len(encoded), step):
+                    append_audio(str(encoded[i:i + step], 'ascii'))
                 self.conversation.commit()
                 self.conversation.create_response()
                 self.last_activity_timestamp = time.time()
@@ -152,10 +164,12 @@ class AIService:
     def _on_connection_opened(self):
         self.connected = True
         self.last_activity_timestamp = time.time()
+        self._connected_event.set()
 
     def _on_connection_closed(self, code, msg):
         logger.info(f"[AI Service] OnClose called, Code: {code}, Msg: {msg}")
         self.connected = False
+        self._connected_event.clear()
         self.session_id = None
         self.last_activity_timestamp = 0
         self.response_done_event.clear()
@@ -163,6 +177,7 @@ class AIService:
     def _on_connection_error(self, error):
         logger.error(f"[AI Service] OnError called: {error}")
         self.connected = False
+        self._connected_event.clear()
         self.session_id = None
         self.last_activity_timestamp = 0
         self.response_done_event.clear()
@@ -170,33 +185,44 @@ class AIService:
     def _handle_response_event(self, response):
         self.last_activity_timestamp = time.time()
         event_type = response.get('type', '')
-        logger.debug(f"[AI Service] Received event: {event_type}")
-        if event_type == 'session.created':
-            self.session_id = response.get('session', {}).get('id')
-            logger.info(f"[AI Service] Session created with ID: {self.session_id}")
-        elif event_type == 'conversation.item.input_audio_transcription.completed':
-            transcript = response.get('transcript', '')
-            logger.debug(f"[AI Service] Transcribed user input: {transcript}")
-            if self.on_user_transcript_callback: self.on_user_transcript_callback(transcript)
-        elif event_type == 'response.audio_transcript.delta':
-            delta_text = response.get('delta', '')
-            logger.debug(f"[AI Service] AI text received: {delta_text}")
-            if self.on_ai_text_callback: self.on_ai_text_callback(delta_text)
-        elif event_type == 'response.audio.delta':
-            audio_delta = response.get('delta', '')
-            logger.debug(f"[AI Service] AI audio chunk received, length: {len(audio_delta)} chars.")
-            try:
-                if self.on_audio_play_started_callback and not self.audio_play_service._is_playing:
-                    self.on_audio_play_started_callback()
-                audio_bytes = base64.b64decode(audio_delta)
-                self.audio_play_service.submit_audio_chunk(audio_bytes)
-            except Exception as e:
-                logger.error(f"[AI Service] Error decoding AI audio: {e}")
-        elif event_type == 'response.done':
-            logger.info("[AI Service] AI response completed (API side).")
-            self.audio_play_service.submit_audio_chunk(None)
-            self.response_done_event.set()
-            if self.on_response_done_callback: self.on_response_done_callback()
+        # 每个事件都会经过这里，关闭 DEBUG 时跳过格式化
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[AI Service] Received event: %s", event_type)
+        handler = self._event_dispatch.get(event_type)
+        if handler:
+            handler(response)
+
+    def _on_session_created(self, response):
+        self.session_id = response.get('session', {}).get('id')
+        logger.info(f"[AI Service] Session created with ID: {self.session_id}")
+
+    def _on_user_transcript(self, response):
+        transcript = response.get('transcript', '')
+        logger.debug(f"[AI Service] Transcribed user input: {transcript}")
+        if self.on_user_transcript_callback: self.on_user_transcript_callback(transcript)
+
+    def _on_ai_text(self, response):
+        delta_text = response.get('delta', '')
+        logger.debug("[AI Service] AI text received: %s", delta_text)
+        if self.on_ai_text_callback: self.on_ai_text_callback(delta_text)
+
+    def _on_audio_delta(self, response):
+        audio_delta = response.get('delta', '')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[AI Service] AI audio chunk received, length: %d chars.", len(audio_delta))
+        try:
+            if self.on_audio_play_started_callback and not self.audio_play_service._is_playing:
+                self.on_audio_play_started_callback()
+            # base64 解码交给播放线程，回调线程只负责入队
+            self.audio_play_service.submit_audio_chunk(audio_delta)
+        except Exception as e:
+            logger.error(f"[AI Service] Error submitting AI audio: {e}")
+
+    def _on_response_done(self, response):
+        logger.info("[AI Service] AI response completed (API side).")
+        self.audio_play_service.submit_audio_chunk(None)
+        self.response_done_event.set()
+        if self.on_response_done_callback: self.on_response_done_callback()
 
     def set_callbacks(self, user_transcript_cb=None, ai_text_cb=None, audio_play_started_cb=None, response_done_cb=None):
         self.on_user_transcript_callback = user_transcript_cb
@@ -2,25 +2,42 @@
 """音频播放服务 - 独立线程播放音频"""
 import threading
 import time
+import base64
 import logging
 import pyaudio
-from queue import Queue
+from collections import deque
 from config import AUDIO_RATE_PLAYBACK, AUDIO_CHANNELS
 
 logger = logging.getLogger(__name__)
 
+# 小块音频先攒到该长度再入队（base64 字符数，约合 9600 字节 = 200ms @ 24k 16bit 单声道）
+PLAYBACK_FLUSH_CHARS = 12800
+# 回调模式每次拉取的帧数（50ms @ 24k）
+PLAYBACK_FRAMES_PER_BUFFER = 1200
+# 16bit 采样
+PLAYBACK_SAMPLE_WIDTH = 2
+
 class AudioPlayService:
     def __init__(self):
         self.pya = pyaudio.PyAudio() # Create PyAudio instance once
         self.output_stream = None
         self.stream_lock = threading.Lock()
-        self.audio_queue = Queue() # Thread-safe queue for audio data
+        # 待播放数据块，由 _playback_lock 保护；_data_event 置位当且仅当队列非空
+        self._chunks = deque()
+        self._data_event = threading.Event()
         self.playback_finished_event = threading.Event()
         self.shutdown_event = threading.Event() # Signal to stop the audio thread
         self.audio_thread = None
         # NEW: Flag to track if we are currently playing
         self._is_playing = False
-        self._playback_lock = threading.Lock() # Lock to protect _is_playing flag
+        self._playback_lock = threading.Lock() # Lock to protect _is_playing flag and _pending
+        self._pending = [] # 尚未入队的 base64 音频片段
+        self._pending_chars = 0
+        # 已解码、待 PortAudio 回调拉取的 PCM 数据；_ring_empty 置位当且仅当其为空
+        self._ring = bytearray()
+        self._ring_lock = threading.Lock()
+        self._ring_empty = threading.Event()
+        self._ring_empty.set()
 
     def start(self):
         """Start the audio playback thread."""
@@ -35,24 +52,55 @@ class AudioPlayService:
         """Stop the audio playback thread."""
         logger.info("[Audio Play Service] Stopping audio playback thread...")
         self.shutdown_event.set()
-        self.audio_queue.put(None) # Wake up the thread if it's waiting on the queue
+        with self._playback_lock:
+            self._enqueue(None) # Wake up the thread if it's waiting on the queue
         if self.audio_thread and self.audio_thread.is_alive():
             self.audio_thread.join(timeout=5.0) # Wait up to 5 seconds
             if self.audio_thread.is_alive():
                 logger.warning("[Audio Play Service] Audio thread did not stop gracefully.")
         logger.info("[Audio Play Service] Audio playback thread stopped.")
 
-    def submit_audio_chunk(self, audio_bytes):
-        """Submit an audio chunk for playback."""
-        if audio_bytes is not None:
-             logger.debug(f"[Audio Play Service] Submitting audio chunk of {len(audio_bytes)} bytes.")
+    def submit_audio_chunk(self, audio_b64):
+        """提交一段 base64 编码的音频（None 表示本次回复结束），解码在播放线程中进行"""
+        if audio_b64 is not None and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[Audio Play Service] Submitting audio chunk of %d chars.", len(audio_b64))
         # NEW: Mark that we are starting a new playback session if the first chunk arrives
         with self._playback_lock:
             if not self._is_playing:
                 self._is_playing = True
                 # Clear the finished event at the start of a new session
                 self.playback_finished_event.clear()
-        self.audio_queue.put(audio_bytes)
+            if audio_b64 is None:
+                # 结束标记：先把剩余数据入队
+                if self._pending:
+                    self._flush_pending()
+                self._enqueue(None)
+                return
+            # 每段 base64 各自带填充，不能直接拼接，按列表整体入队
+            self._pending.append(audio_b64)
+            self._pending_chars += len(audio_b64)
+            if self._pending_chars >= PLAYBACK_FLUSH_CHARS:
+                self._flush_pending()
+
+    @staticmethod
+    def _decode_batch(parts):
+        """解码一批 base64 片段；除末尾外均无填充时拼接后一次解码"""
+        joined = "".join(parts)
+        # 只有末尾两个字符可以是填充，中间出现 '=' 说明某段自带填充，需逐段解码
+        if joined.find("=", 0, len(joined) - 2) == -1:
+            return base64.b64decode(joined)
+        return b"".join(map(base64.b64decode, parts))
+
+    def _flush_pending(self):
+        """调用方需持有 _playback_lock"""
+        self._enqueue(self._pending)
+        self._pending = []
+        self._pending_chars = 0
+
+    def _enqueue(self, item):
+        """调用方需持有 _playback_lock"""
+        self._chunks.append(item)
+        self._data_event.set()
 
     def wait_for_playback_to_finish(self, timeout=10):
         """Wait for the current playback session to finish."""
@@ -87,7 +135,8 @@ class AudioPlayService:
                         channels=AUDIO_CHANNELS,
                         rate=AUDIO_RATE_PLAYBACK,
                         output=True,
-                        frames_per_buffer=4800 # 200ms @ 24k
+                        frames_per_buffer=PLAYBACK_FRAMES_PER_BUFFER,
+                        stream_callback=self._pa_callback # 回调模式，由 PortAudio 按自身节奏拉取数据
                     )
                     logger.debug(f"[Audio Play Service] Output stream initialized at {AUDIO_RATE_PLAYBACK}Hz.")
                 except Exception as e:
@@ -95,22 +144,62 @@ class AudioPlayService:
                     return None
             return self.output_stream
 
+    def _pa_callback(self, in_data, frame_count, time_info, status):
+        """PortAudio 回调：从环形缓冲区取出所需帧数，数据不足时补静音"""
+        nbytes = frame_count * AUDIO_CHANNELS * PLAYBACK_SAMPLE_WIDTH
+        with self._ring_lock:
+            data = bytes(self._ring[:nbytes])
+            del self._ring[:nbytes]
+            if not self._ring:
+                self._ring_empty.set()
+        if len(data) < nbytes:
+            data += bytes(nbytes - len(data))
+        return data, pyaudio.paContinue
+
+    def _feed_ring(self, pcm):
+        """Append decoded PCM for the callback to consume."""
+        with self._ring_lock:
+            self._ring += pcm
+            self._ring_empty.clear()
+
+    def _wait_ring_drained(self):
+        """等待回调取完缓冲区中的数据，超时按剩余时长估算"""
+        with self._ring_lock:
+            remaining = len(self._ring)
+        if remaining:
+            seconds = remaining / (AUDIO_RATE_PLAYBACK * AUDIO_CHANNELS * PLAYBACK_SAMPLE_WIDTH)
+            if not self._ring_empty.wait(timeout=seconds + 1.0):
+                logger.warning("[Audio Play Service] Timeout waiting for ring buffer to drain.")
+
+    def _clear_ring(self):
+        with self._ring_lock:
+            self._ring.clear()
+            self._ring_empty.set()
+
     def _playback_worker(self):
         """The main loop of the audio playback thread."""
         logger.debug("[Audio Play Service] Playback worker thread started.")
+        stream = None # 本线程缓存的输出流，会话结束关闭后重新获取
+        feed_ring = self._feed_ring
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
         while not self.shutdown_event.is_set():
-            try:
-                # Get audio data from the queue, blocking with timeout to allow shutdown checks
-                audio_data = self.audio_queue.get(timeout=0.1)
-            except: # queue.Empty
-                continue # Check shutdown event again
+            # 无超时阻塞等待，空闲时不再周期唤醒；stop() 会放入 None 唤醒线程
+            self._data_event.wait()
+            with self._playback_lock:
+                audio_data = self._chunks.popleft()
+                if not self._chunks:
+                    self._data_event.clear()
 
+            if audio_data is None and self.shutdown_event.is_set():
+                break
             if audio_data is None: # End-of-stream marker for the *current* session
                 logger.debug("[Audio Play Service] Received end-of-stream marker in queue.")
                 # Play remaining buffered data
                 with self.stream_lock:
                     if self.output_stream:
                         try:
+                            # 先等回调把缓冲区中的数据取完
+                            self._wait_ring_drained()
                             logger.debug("[Audio Play Service] Calling stop_stream() to flush buffer.")
                             # NEW: Sleep for output latency BEFORE calling stop_stream
                             try:
@@ -128,6 +217,7 @@ class AudioPlayService:
                             self.output_stream = None
                         except Exception as e:
                             logger.error(f"[Audio Play Service] Error during stream closure: {e}")
+                self._clear_ring()
                 # Set the finished event
                 self.playback_finished_event.set()
                 logger.debug("[Audio Play Service] Playback finished event set.")
@@ -138,15 +228,21 @@ class AudioPlayService:
                 continue
             else:
                 # Play the audio data
-                stream = self._get_output_stream()
-                if stream:
-                    try:
-                        stream.write(audio_data)
-                        logger.debug(f"[Audio Play Service] Wrote {len(audio_data)} bytes to stream.")
-                    except Exception as e:
-                        logger.error(f"[Audio Play Service] Error writing to stream: {e}")
-                else:
-                    logger.error("[Audio Play Service] Could not get output stream for playback.")
+                try:
+                    audio_data = self._decode_batch(audio_data)
+                except Exception as e:
+                    logger.error(f"[Audio Play Service] Error decoding audio: {e}")
+                    continue
+                # 先入缓冲区再打开流，回调首次拉取即有数据；播放线程不再阻塞在 write 上
+                feed_ring(audio_data)
+                if debug_enabled:
+                    logger.debug("[Audio Play Service] Buffered %d bytes for playback.", len(audio_data))
+                # 仅在流已被关闭（结束标记处置空）时才重新获取，避免每块都加锁并调用 is_stopped()
+                if stream is None or self.output_stream is None:
+                    stream = self._get_output_stream()
+                    if not stream:
+                        logger.error("[Audio Play Service] Could not get output stream for playback.")
+                        self._clear_ring()
 
         # Upon shutdown, ensure stream is closed if it's still open
         with self.stream_lock:
@@ -166,6 +262,7 @@ class AudioPlayService:
                 except Exception as e:
                     logger.error(f"[Audio Play Service] Error closing stream on shutdown: {e}")
                 self.output_stream = None
+        self._clear_ring()
 
         # NEW: Do NOT terminate PyAudio here if it's meant to be reused across sessions.
         # The PyAudio instance should ideally be terminated in the destructor or a dedicated cleanup method.
@@ -3,10 +3,16 @@
 import pyaudio
 import threading
 import logging
-from config import AUDIO_RATE_RECORDING, AUDIO_CHANNELS
+import numpy as np
+from config import (
+    AUDIO_RATE_RECORDING, AUDIO_CHANNELS, AUDIO_MAX_RECORD_SECONDS,
+    AUDIO_TRIM_SILENCE, AUDIO_SILENCE_PEAK
+)
 
 logger = logging.getLogger(__name__)
 AUDIO_FORMAT_PA = pyaudio.paInt16
+EMPTY_AUDIO = memoryview(b'')
+SILENCE_BLOCK_SAMPLES = AUDIO_RATE_RECORDING * AUDIO_CHANNELS // 10 # 100ms
 
 class AudioRecordService:
     def __init__(self):
@@ -14,64 +20,127 @@ class AudioRecordService:
         self.input_stream = None
         self.recording_lock = threading.Lock()
         self.recording_stop_event = threading.Event() # 用于停止录音的事件
+        # 预分配的 int16 录音缓冲区，由 PortAudio 回调线程顺序写入（单位：采样点）
+        self._pcm = np.empty(AUDIO_RATE_RECORDING * AUDIO_CHANNELS * AUDIO_MAX_RECORD_SECONDS, dtype=np.int16)
+        self._pcm_bytes = memoryview(self._pcm).cast('B') # 同一缓冲区的字节视图
+        self._pcm_pos = 0
+        self._overflowed = False
+        self._device_idx = self._resolve_input_device() # 缓存输入设备索引，避免每次录音都枚举设备
+
+    def _resolve_input_device(self):
+        """查找录音输入设备，找不到时返回 None"""
+        try:
+            return self.pya.get_default_input_device_info()['index']
+        except Exception as e:
+            logger.error(f"No default input device: {e}")
+        # 尝试查找其他输入设备
+        for i in range(self.pya.get_device_count()):
+            try:
+                info = self.pya.get_device_info_by_index(i)
+                if info['maxInputChannels'] > 0:
+                    return i
+            except: continue
+        logger.error("No input device found for recording.")
+        return None
+
+    def _open_input_stream(self):
+        return self.pya.open(
+            format=AUDIO_FORMAT_PA,
+            channels=AUDIO_CHANNELS,
+            rate=AUDIO_RATE_RECORDING,
+            input=True,
+            input_device_index=self._device_idx,
+            frames_per_buffer=3200, # 100ms @ 16k
+            start=False,
+            stream_callback=self._on_audio
+        )
 
     def start_recording(self):
-        """开始录音，阻塞直到用户停止或收到停止信号"""
+        """开始录音，阻塞直到用户停止或收到停止信号
+
+        返回指向内部 int16 录音缓冲区的字节 memoryview，在下一次录音开始前有效。
+        """
         with self.recording_lock:
-            if self.input_stream:
+            if self.input_stream and self.input_stream.is_active():
                 logger.warning("Recording already in progress, ignoring start request.")
-                return b""
+                return EMPTY_AUDIO
 
             logger.info("Starting audio recording...")
-            # 查找输入设备
+            if self._device_idx is None:
+                self._device_idx = self._resolve_input_device()
+                if self._device_idx is None:
+                    self.recording_stop_event.clear() # 本次录音未能开始，丢弃针对它的停止信号
+                    return EMPTY_AUDIO
+
+            self._pcm_pos = 0
+            self._overflowed = False
+            # 不在这里清除停止事件：排队期间用户已按下的停止必须生效，事件在录音结束后才清除
             try:
-                device_idx = self.pya.get_default_input_device_info()['index']
-            except Exception as e:
-                logger.error(f"No default input device: {e}")
-                # 尝试查找其他输入设备
-                device_found = False
-                for i in range(self.pya.get_device_count()):
+                # 输入流只在首次录音时打开，之后每次录音仅 start/stop
+                if not self.input_stream:
                     try:
-                        info = self.pya.get_device_info_by_index(i)
-                        if info['maxInputChannels'] > 0:
-                            device_idx = i
-                            device_found = True
-                            break
-                    except: continue
-                if not device_found:
-                    logger.error("No input device found for recording.")
-                    return b''
+                        self.input_stream = self._open_input_stream()
+                    except OSError as e:
+                        # 设备可能已被拔出或重新枚举，重新查找一次后重试
+                        logger.warning(f"Failed to open cached input device {self._device_idx}: {e}, re-resolving.")
+                        self._device_idx = self._resolve_input_device()
+                        if self._device_idx is None:
+                            self.recording_stop_event.clear()
+                            return EMPTY_AUDIO
+                        self.input_stream = self._open_input_stream()
+                # 回调模式：PortAudio 线程推送数据，本线程只需等待停止信号
+                self.input_stream.start_stream()
+            except Exception as e:
+                logger.error(f"Failed to start input stream: {e}")
+                self._safe_close_input_stream() # 下次录音时重新打开
+                return EMPTY_AUDIO
+
+            # 本线程在内核中等待停止信号；缓冲区写满后无需继续等待
+            if not self.recording_stop_event.wait(timeout=AUDIO_MAX_RECORD_SECONDS):
+                logger.info(f"Recording reached {AUDIO_MAX_RECORD_SECONDS}s limit, stopping automatically.")
 
+            # 录音结束，停止但不关闭输入流
             try:
-                self.input_stream = self.pya.open(
-                    format=AUDIO_FORMAT_PA,
-                    channels=AUDIO_CHANNELS,
-                    rate=AUDIO_RATE_RECORDING,
-                    input=True,
-                    input_device_index=device_idx,
-                    frames_per_buffer=3200 # 100ms @ 16k
-                )
+                self.input_stream.stop_stream()
             except Exception as e:
-                logger.error(f"Failed to open input stream: {e}")
-                return b''
-
-            frames = []
-            self.recording_stop_event.clear() # 确保停止事件未被设置
+                logger.warning(f"Error stopping input stream: {e}")
+                self._safe_close_input_stream()
+            self.recording_stop_event.clear()
+            if self._overflowed:
+                logger.warning(f"Recording exceeded {AUDIO_MAX_RECORD_SECONDS}s, extra audio was dropped.")
+            start, end = 0, self._pcm_pos
+            if AUDIO_TRIM_SILENCE:
+                start, end = self._find_voiced_range(end)
+            recorded_data = self._pcm_bytes[start * 2:end * 2]
+            logger.info(f"Recording stopped. Captured {self._pcm_pos * 2} bytes, sending {recorded_data.nbytes} bytes.")
+            return recorded_data
 
-            # 循环录音
-            while not self.recording_stop_event.is_set(): # 检查停止事件
-                try:
-                    data = self.input_stream.read(3200, exception_on_overflow=False)
-                    frames.append(data)
-                except Exception as e:
-                    logger.error(f"Error reading from input stream: {e}")
-                    break
+    def _find_voiced_range(self, n_samples):
+        """按 100ms 块计算峰值，返回去掉首尾静音块后的采样点范围（各保留一块余量）"""
+        n_blocks = n_samples // SILENCE_BLOCK_SAMPLES
+        if n_blocks == 0:
+            return 0, n_samples
+        blocks = self._pcm[:n_blocks * SILENCE_BLOCK_SAMPLES].reshape(n_blocks, SILENCE_BLOCK_SAMPLES)
+        peaks = np.abs(blocks.astype(np.int32)).max(axis=1)
+        voiced = np.flatnonzero(peaks >= AUDIO_SILENCE_PEAK)
+        if voiced.size == 0:
+            return 0, 0
+        start = max(int(voiced[0]) - 1, 0) * SILENCE_BLOCK_SAMPLES
+        last = int(voiced[-1]) + 2
+        end = n_samples if last >= n_blocks else last * SILENCE_BLOCK_SAMPLES
+        return start, end
 
-            # 录音结束，清理资源
-            recorded_data = b''.join(frames)
-            logger.info(f"Recording stopped. Captured {len(recorded_data)} bytes.")
-            self._safe_close_input_stream()
-            return recorded_data
+    def _on_audio(self, in_data, frame_count, time_info, status):
+        """PortAudio 回调：将录音数据块写入预分配缓冲区"""
+        chunk = np.frombuffer(in_data, dtype=np.int16)
+        pos = self._pcm_pos
+        n = min(chunk.size, self._pcm.size - pos)
+        if n < chunk.size:
+            self._overflowed = True
+        if n > 0:
+            self._pcm[pos:pos + n] = chunk[:n]
+            self._pcm_pos = pos + n
+        return (None, pyaudio.paContinue)
 
     def stop_recording(self):
         """外部调用以停止录音"""
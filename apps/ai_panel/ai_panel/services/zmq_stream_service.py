@@ -4,9 +4,10 @@ import zmq
 import socket
 import time
 import threading
+import atexit
 from collections import deque
-from PyQt6.QtCore import QObject, pyqtSignal, Qt, QTimer
-from PyQt6.QtGui import QPixmap, QImage
+from PyQt6.QtCore import QObject, pyqtSignal, Qt, QTimer, QSize, QBuffer, QIODevice
+from PyQt6.QtGui import QPixmap, QImage, QImageReader
 from PIL import Image
 from io import BytesIO
 import logging
@@ -15,12 +16,30 @@ logger = logging.getLogger(__name__)
 
 # --- 从 config 导入服务端公钥路径 ---
 from config import DESKTOP_STREAM_PUB_KEY_PATH
+# --- 服务端格式标识到 Qt 图像格式名的映射 ---
+QT_IMAGE_FORMATS = {"jpg": "JPG", "png": "PNG", "webp": "WEBP"}
+# 消息中的格式标签（bytes）直接查表得到上面的 key，免去每帧 decode()
+_FORMAT_TAGS = {fmt.encode(): fmt for fmt in QT_IMAGE_FORMATS}
+# 缩小倍数超过该值时最近邻采样会严重混叠，改用平滑缩放
+SMOOTH_SCALE_RATIO = 4
 # --- 生成客户端密钥对 ---
 CLIENT_CURVE_PUBLIC_KEY, CLIENT_CURVE_SECRET_KEY = zmq.curve_keypair()
+# 服务端公钥首次读取成功后缓存，重连时不再读盘
+_server_public_key = None
+
+
+def _load_server_public_key():
+    global _server_public_key
+    if _server_public_key is None:
+        with open(DESKTOP_STREAM_PUB_KEY_PATH, 'rb') as f:
+            _server_public_key = f.read()
+        logger.info(f"ZMQ Curve: Loaded server public key from {DESKTOP_STREAM_PUB_KEY_PATH}")
+    return _server_public_key
+
 
 class ZMQStreamService(QObject):
-    frame_decoded = pyqtSignal(QPixmap)
     connection_status_changed = pyqtSignal(bool, str)
+    frame_ready = pyqtSignal() # 无负载通知，GUI 收到后通过 take_frame() 取帧
 
     def __init__(self, tcp_ip, tcp_port, zmq_port, target_size=(160, 128)):
         super().__init__()
@@ -28,6 +47,18 @@ class ZMQStreamService(QObject):
         self.tcp_port = tcp_port
         self.zmq_port = zmq_port
         self.target_width, self.target_height = target_size
+        self._target_qsize = QSize(self.target_width, self.target_height)
+        # JPEG 解码器在解码线程中复用，避免每帧创建
+        self._jpeg_buffer = QBuffer()
+        self._jpeg_reader = QImageReader()
+        self._jpeg_reader.setFormat(QT_IMAGE_FORMATS["jpg"].encode())
+        self._jpeg_reader.setScaledSize(self._target_qsize)
+        # 按 ZMQ 消息中的格式标签直接选择解码函数，未知格式回退 PIL
+        self._decoders = {
+            "jpg": self._decode_jpeg,
+            "png": self._decode_qt,
+            "webp": self._decode_qt,
+        }
 
         self.tcp_socket = None
         self.tcp_lock = threading.Lock()
@@ -36,16 +67,23 @@ class ZMQStreamService(QObject):
         self.zmq_poller = None
         self.zmq_lock = threading.Lock()
 
-        self.service_condition = threading.Condition(threading.RLock())
+        self._state_lock = threading.Lock() # 仅保护状态标志与帧计数，无需 Condition/RLock
         self._running = False
         self._tcp_connected = False
         self._zmq_initialized = False
+        self._stop_event = threading.Event() # disconnect() 设置后各循环立即退出
 
         self.tcp_thread = None
         self.zmq_decode_thread = None
 
+        # 乒乓帧缓冲：解码线程写 _back，每批解码完成后与 _front 交换并发出 frame_ready，GUI 通过 take_frame() 取帧
+        self._buf_lock = threading.Lock()
+        self._front = None
+        self._back = None
+
         self.frame_count = 0
-        self.fps_start_time = time.time()
+        self.dropped_count = 0 # 未显示就被更新帧取代的帧数（批量读取只解码最新一条、GUI 未及时取走）
+        self._fps_start_ns = time.monotonic_ns()
         self.stats_timer = None
 
     def _initialize_zmq_resources(self):
@@ -54,11 +92,8 @@ class ZMQStreamService(QObject):
             self.zmq_sock = self.zmq_ctx.socket(zmq.SUB)
 
             # --- 加载服务端公钥 ---
-            server_public_key = None
             try:
-                with open(DESKTOP_STREAM_PUB_KEY_PATH, 'rb') as f:
-                    server_public_key = f.read()
-                logger.info(f"ZMQ Curve: Loaded server public key from {DESKTOP_STREAM_PUB_KEY_PATH}")
+                server_public_key = _load_server_public_key()
             except FileNotFoundError:
                 logger.error(f"ZMQ Curve: Server public key file not found: {DESKTOP_STREAM_PUB_KEY_PATH}")
                 raise FileNotFoundError(f"Server public key file '{DESKTOP_STREAM_PUB_KEY_PATH}' not found.")
@@ -74,9 +109,11 @@ class ZMQStreamService(QObject):
             self.zmq_sock.setsockopt(zmq.CURVE_SECRETKEY, CLIENT_CURVE_SECRET_KEY)
             # ---
 
+            # RCVHWM only applies to connections made after it is set.
+            # CONFLATE is not usable here: it does not support multipart messages.
+            self.zmq_sock.setsockopt(zmq.RCVHWM, 2)
             self.zmq_sock.connect(f"tcp://{self.tcp_ip}:{self.zmq_port}")
             self.zmq_sock.setsockopt(zmq.SUBSCRIBE, b"")
-            self.zmq_sock.setsockopt(zmq.RCVHWM, 2)
             self.zmq_poller = zmq.Poller()
             self.zmq_poller.register(self.zmq_sock, zmq.POLLIN)
             self._zmq_initialized = True
@@ -109,16 +146,18 @@ class ZMQStreamService(QObject):
         logger.debug("ZMQ resources cleaned up.")
 
     def connect(self):
-        with self.service_condition:
+        with self._state_lock:
             if self._running:
                 logger.warning("ZMQStreamService: Already running, ignoring connect request.")
                 return
 
             logger.info(f"Attempting to connect to {self.tcp_ip}:{self.tcp_port} (TCP) and {self.tcp_ip}:{self.zmq_port} (ZMQ)")
             self._running = True
+            self._stop_event.clear()
             self._tcp_connected = False
             self._zmq_initialized = False
-            self.service_condition.notify_all()
+        # 进程退出时兜底断开，替代 __del__ 中不可控的清理
+        atexit.register(self.disconnect)
 
         self.connection_status_changed.emit(False, "Connecting...")
 
@@ -141,6 +180,7 @@ class ZMQStreamService(QObject):
 
     def disconnect(self):
         logger.info("Disconnecting...")
+        atexit.unregister(self.disconnect)
 
         if self.stats_timer:
             self.stats_timer.stop()
@@ -148,10 +188,10 @@ class ZMQStreamService(QObject):
             self.stats_timer = None
             logger.info("Stats timer stopped and scheduled for deletion.")
 
-        with self.service_condition:
+        with self._state_lock:
             was_running = self._running
             self._running = False
-            self.service_condition.notify_all()
+            self._stop_event.set()
 
         self._force_close_sockets()
         self._cleanup_and_notify(status_message="Disconnected" if was_running else "Already disconnected")
@@ -182,53 +222,40 @@ class ZMQStreamService(QObject):
         heartbeat_interval = 1.0
         reconnect_interval = 5.0
 
-        while True:
-            with self.service_condition:
-                if not self._running:
-                    break
-
+        while not self._stop_event.is_set():
             if not self._tcp_connect():
-                with self.service_condition:
-                    if not self._running:
-                        break
-                time.sleep(reconnect_interval)
+                # wait() returns True as soon as disconnect() sets the event
+                if self._stop_event.wait(reconnect_interval):
+                    break
                 continue
 
-            while True:
-                with self.service_condition:
-                    if not self._running or not self._tcp_connected:
-                        break
-
-                time.sleep(heartbeat_interval)
-
-                with self.service_condition:
-                    if not self._running or not self._tcp_connected:
-                        break
+            while self._tcp_connected:
+                if self._stop_event.wait(heartbeat_interval):
+                    break
+                if not self._tcp_connected:
+                    break
 
                 try:
                     with self.tcp_lock:
                         if not self.tcp_socket:
                             break
                         self.tcp_socket.send(b"hb")
-                    with self.service_condition:
-                        self._last_heartbeat_time = time.time()
-                        if self._running and self._tcp_connected:
-                            self.connection_status_changed.emit(True, "Streaming...")
+                    self._last_heartbeat_time = time.time()
+                    if not self._stop_event.is_set() and self._tcp_connected:
+                        self.connection_status_changed.emit(True, "Streaming...")
                 except Exception as e:
                     logger.warning(f"Heartbeat failed: {e}")
                     break
 
-            with self.service_condition:
-                if not self._running:
-                    break
-                self._tcp_disconnect()
+            if self._stop_event.is_set():
+                break
+            self._tcp_disconnect()
         logger.debug("TCP control loop ended.")
 
     def _tcp_connect(self):
         try:
-            with self.service_condition:
-                if not self._running:
-                    return False
+            if self._stop_event.is_set():
+                return False
 
             with self.tcp_lock:
                 if self.tcp_socket:
@@ -239,21 +266,32 @@ class ZMQStreamService(QObject):
                 self.tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 self.tcp_socket.settimeout(3.0)
                 self.tcp_socket.connect((self.tcp_ip, self.tcp_port))
+                self._tune_tcp_socket(self.tcp_socket)
                 self.tcp_socket.send(b"client_connected")
                 response = self.tcp_socket.recv(1024)
 
             logger.info(f"TCP control connection established: {response.decode()}")
-            with self.service_condition:
-                self._tcp_connected = True
+            self._tcp_connected = True
             return True
         except Exception as e:
             logger.warning(f"TCP connection failed: {e}")
             self._tcp_disconnect()
-            with self.service_condition:
-                if self._running:
-                    self.connection_status_changed.emit(False, f"TCP Conn Error: {e}")
+            if not self._stop_event.is_set():
+                self.connection_status_changed.emit(False, f"TCP Conn Error: {e}")
             return False
 
+    @staticmethod
+    def _tune_tcp_socket(sock):
+        """关闭 Nagle/延迟 ACK，并开启快速 keepalive 以便尽快发现断线"""
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if hasattr(socket, "TCP_QUICKACK"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 3)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 1)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+
     def _tcp_disconnect(self):
         with self.tcp_lock:
             if self.tcp_socket:
@@ -262,8 +300,7 @@ class ZMQStreamService(QObject):
                 try: self.tcp_socket.close()
                 except OSError: pass
                 self.tcp_socket = None
-        with self.service_condition:
-            self._tcp_connected = False
+        self._tcp_connected = False
 
     def _zmq_receive_decode_loop(self):
         poll_timeout = 1000
@@ -272,7 +309,7 @@ class ZMQStreamService(QObject):
 
         logger.debug("ZMQ receive+decode loop started.")
         while True:
-            with self.service_condition:
+            with self._state_lock:
                 if not self._running:
                     logger.debug("ZMQ loop exiting due to stop signal.")
                     break
@@ -293,78 +330,130 @@ class ZMQStreamService(QObject):
                         logger.debug("ZMQ resources invalid, setting re-init flag.")
                         zmq_reinit_needed = True
                         continue
-                    received_messages = []
+                    # Only the newest message of a drain is decoded, older ones are stale
+                    latest = None
+                    received = 0
                     socks = dict(self.zmq_poller.poll(poll_timeout))
-                    while self.zmq_sock in socks and socks[self.zmq_sock] == zmq.POLLIN:
+                    if socks.get(self.zmq_sock) == zmq.POLLIN:
+                        # NOBLOCK 读到 zmq.Again 即队列已空，不必每条消息后再 poll(0)
                         try:
-                            format_bytes, data = self.zmq_sock.recv_multipart(flags=zmq.NOBLOCK)
-                            format_hint = format_bytes.decode()
-                            received_messages.append((format_hint, data))
-                            socks = dict(self.zmq_poller.poll(0))
+                            while True:
+                                # copy=False keeps the payload in libzmq's buffer (zmq.Frame)
+                                latest = self.zmq_sock.recv_multipart(flags=zmq.NOBLOCK, copy=False)
+                                received += 1
                         except zmq.Again:
-                            break
+                            pass
                         except Exception as e:
                             logger.warning(f"Error receiving ZMQ multipart: {e}")
                             zmq_reinit_needed = True
-                            break
 
-                    if not zmq_reinit_needed:
-                        for format_hint, data in received_messages:
-                            pixmap = self._decode_image_to_pixmap(data, format_hint)
-                            if pixmap:
-                                self.frame_decoded.emit(pixmap)
-                                with self.service_condition:
-                                    self.frame_count += 1
+                    if not zmq_reinit_needed and latest is not None:
+                        format_frame, data_frame = latest
+                        # data_frame stays referenced until decode returns, so its buffer is valid
+                        format_tag = format_frame.bytes
+                        format_hint = _FORMAT_TAGS.get(format_tag) or format_tag.decode()
+                        frame = self._decode_frame(data_frame.buffer, format_hint)
+                        if frame:
+                            # 附带压缩数据（引用 libzmq 缓冲区，不复制），只在需要分析的帧上由使用方计算摘要
+                            self._back = (*frame, data_frame.buffer)
+                            # 被跳过的旧帧也计入接收帧率
+                            with self._state_lock:
+                                self.frame_count += received
+                                self.dropped_count += received - 1
+                        if self._back is not None:
+                            with self._buf_lock:
+                                notify = self._front is None
+                                self._front, self._back = self._back, None
+                            # 上一帧尚未被取走时已有通知在途，不重复发送；被覆盖的那一帧计为丢弃
+                            if notify:
+                                self.frame_ready.emit()
+                            else:
+                                with self._state_lock:
+                                    self.dropped_count += 1
             except Exception as e:
                 logger.error(f"Unexpected error in ZMQ receive+decode loop: {e}")
                 zmq_reinit_needed = True
         logger.debug("ZMQ receive+decode loop ended.")
 
-    def _decode_image_to_pixmap(self, image_data, format_hint):
+    def _decode_frame(self, image_data, format_hint):
+        """解码为 (QPixmap, QImage)：QPixmap 用于显示，QImage 为 CPU 端像素，供分析时免去 toImage() 回读"""
         try:
-            img = Image.open(BytesIO(image_data))
-            if img.mode != "RGB":
-                img = img.convert("RGB")
-
-            qimg = QImage(
-                img.tobytes(),
-                img.width,
-                img.height,
-                QImage.Format.Format_RGB888
-            )
-            pixmap = QPixmap.fromImage(qimg)
-            scaled = pixmap.scaled(
-                self.target_width, self.target_height,
-                Qt.AspectRatioMode.IgnoreAspectRatio,
-                Qt.TransformationMode.FastTransformation
-            )
-            return scaled
+            decoder = self._decoders.get(format_hint)
+            qimg = decoder(image_data, format_hint) if decoder else self._decode_with_pil(image_data)
+            if qimg.isNull():
+                qimg = self._decode_with_pil(image_data)
+
+            if qimg.width() != self.target_width or qimg.height() != self.target_height:
+                if qimg.width() > self.target_width * SMOOTH_SCALE_RATIO:
+                    mode = Qt.TransformationMode.SmoothTransformation
+                else:
+                    mode = Qt.TransformationMode.FastTransformation
+                qimg = qimg.scaled(
+                    self.target_width, self.target_height,
+                    Qt.AspectRatioMode.IgnoreAspectRatio,
+                    mode
+                )
+            return QPixmap.fromImage(qimg), qimg
         except Exception as e:
             logger.warning(f"Decode error for format {format_hint}: {e}")
             return None
 
+    def _decode_jpeg(self, image_data, format_hint):
+        # 设置目标尺寸后 libjpeg 在 IDCT 阶段直接按 1/2、1/4、1/8 缩小解码，不再生成全分辨率中间图
+        # 复用同一 QBuffer/QImageReader，每帧只替换数据
+        buffer = self._jpeg_buffer
+        buffer.close()
+        buffer.setData(image_data)
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        self._jpeg_reader.setDevice(buffer)
+        return self._jpeg_reader.read()
+
+    def _decode_qt(self, image_data, format_hint):
+        # Qt 原生解码器（libpng/libwebp）直接解码到 QImage，避免 PIL 的额外拷贝
+        return QImage.fromData(image_data, QT_IMAGE_FORMATS[format_hint])
+
+    def _decode_with_pil(self, image_data):
+        """Qt 缺少对应图像插件时回退到 PIL 解码"""
+        img = Image.open(BytesIO(image_data))
+        # JPEG 时让 libjpeg 按比例缩小解码，其它格式忽略
+        img.draft("RGB", (self.target_width * 2, self.target_height * 2))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        data = img.tobytes()
+        # copy() detaches the QImage from the temporary bytes buffer
+        return QImage(data, img.width, img.height, img.width * 3, QImage.Format.Format_RGB888).copy()
+
+    def take_frame(self):
+        """取出最近一批解码完成的帧 (QPixmap, QImage, 压缩数据)（GUI 线程调用），没有新帧时返回 None"""
+        with self._buf_lock:
+            frame, self._front = self._front, None
+        return frame
+
     def _log_stats(self):
         if not self._running:
             logger.debug("Stats timer fired, but service is inactive. Skipping log.")
             return
 
-        current_time = time.time()
-        duration = current_time - self.fps_start_time
-        recv_fps = self.frame_count / duration if duration > 0 else 0
-
-        logger.info(f"ZMQ Service Recv FPS: {recv_fps:.1f}")
+        now_ns = time.monotonic_ns()
+        # 取值与清零放在同一把锁内，避免与解码线程的累加交错丢帧
+        with self._state_lock:
+            frame_count, self.frame_count = self.frame_count, 0
+            dropped_count, self.dropped_count = self.dropped_count, 0
+        recv_fps = frame_count * 1_000_000_000 / max(now_ns - self._fps_start_ns, 1)
+        self._fps_start_ns = now_ns
 
-        self.frame_count = 0
-        self.fps_start_time = current_time
+        logger.info(f"ZMQ Service Recv FPS: {recv_fps:.1f}, Dropped: {dropped_count}/{frame_count}")
 
     def get_current_fps(self):
-        with self.service_condition:
-            current_time = time.time()
-            duration = current_time - self.fps_start_time
-            fps = self.frame_count / duration if duration > 0 else 0
-        return fps
-
-    def __del__(self):
-        if self._running:
-            logger.warning("ZMQStreamService: Destructor called while still running! Calling disconnect.")
-            self.disconnect()
+        # frame_count 的读取在 GIL 下是原子的，只读统计无需加锁
+        elapsed_ns = max(time.monotonic_ns() - self._fps_start_ns, 1)
+        return self.frame_count * 1_000_000_000 / elapsed_ns
+
+    def close(self):
+        self.disconnect()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
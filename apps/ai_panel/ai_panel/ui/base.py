@@ -10,23 +10,52 @@ logger = logging.getLogger(__name__)
 
 class BasePanel(QWidget):
     """所有面板的基类"""
+    # 字体与调色板在首个面板创建时构造一次（需在 QApplication 之后），各控件共用
+    _FONT_LARGE = None
+    _FONT_MEDIUM = None
+    _FONT_SMALL = None
+    _PALETTE = None
+
+    _PROGRESS_STYLE = """
+        QProgressBar {{
+            border: 1px solid #555;
+            border-radius: 3px;
+            background-color: #333;
+            max-width: {bar_width}px;
+        }}
+        QProgressBar::chunk {{
+            background-color: {color};
+            border-radius: 2px;
+        }}
+        """
+
     def __init__(self):
         super().__init__()
+        self._ensure_style()
         self.init_style()
 
-    def init_style(self):
-        """统一深灰背景风格"""
+    @classmethod
+    def _ensure_style(cls):
+        if cls._PALETTE is not None:
+            return
+        cls._FONT_LARGE = QFont(FONT_FAMILY, FONT_SIZE_LARGE, QFont.Weight.DemiBold)
+        cls._FONT_MEDIUM = QFont(FONT_FAMILY, FONT_SIZE_MEDIUM, QFont.Weight.Medium)
+        cls._FONT_SMALL = QFont(FONT_FAMILY, FONT_SIZE_SMALL)
         palette = QPalette()
         palette.setColor(QPalette.ColorRole.Window, QColor(28, 28, 28))   # #1c1c1c
         palette.setColor(QPalette.ColorRole.WindowText, QColor(240, 240, 240)) # #f0f0f0
-        self.setPalette(palette)
+        cls._PALETTE = palette
+
+    def init_style(self):
+        """统一深灰背景风格"""
+        self.setPalette(self._PALETTE)
         self.setAutoFillBackground(True)
 
     def create_title(self, text: str, color: str = "#54a0ff") -> QLabel:
         """创建顶部标题"""
         label = QLabel(text)
         label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        label.setFont(QFont(FONT_FAMILY, FONT_SIZE_LARGE, QFont.Weight.DemiBold))
+        label.setFont(self._FONT_LARGE)
         label.setStyleSheet(f"color: {color};")
         return label
 
@@ -41,11 +70,11 @@ class BasePanel(QWidget):
                    color: str = "#aaa") -> tuple:
         """创建左右布局行 (标签+内容)"""
         label = QLabel(label_text)
-        label.setFont(QFont(FONT_FAMILY, FONT_SIZE_MEDIUM, QFont.Weight.Medium))
+        label.setFont(self._FONT_MEDIUM)
         label.setStyleSheet(f"color: {color}; min-width: {label_width}px;")
         label.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
         value = QLabel("")
-        value.setFont(QFont(FONT_FAMILY, FONT_SIZE_SMALL))
+        value.setFont(self._FONT_SMALL)
         value.setStyleSheet(f"color: {color};")
         value.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
         return label, value
@@ -54,7 +83,7 @@ class BasePanel(QWidget):
                             bar_width: int = 70) -> tuple:
         """创建带进度条的行"""
         label = QLabel(label_text)
-        label.setFont(QFont(FONT_FAMILY, FONT_SIZE_MEDIUM, QFont.Weight.Medium))
+        label.setFont(self._FONT_MEDIUM)
         label.setStyleSheet(f"color: {color}; min-width: 28px;")
         label.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
 
@@ -63,26 +92,15 @@ class BasePanel(QWidget):
         bar.setValue(0)
         bar.setTextVisible(False)
         bar.setFixedHeight(8)
-        bar.setStyleSheet(f"""
-        QProgressBar {{
-            border: 1px solid #555;
-            border-radius: 3px;
-            background-color: #333;
-            max-width: {bar_width}px;
-        }}
-        QProgressBar::chunk {{
-            background-color: {color};
-            border-radius: 2px;
-        }}
-        """)
+        bar.setStyleSheet(self._PROGRESS_STYLE.format(bar_width=bar_width, color=color))
 
         percent = QLabel("0%")
-        percent.setFont(QFont(FONT_FAMILY, FONT_SIZE_SMALL))
+        percent.setFont(self._FONT_SMALL)
         percent.setStyleSheet(f"color: {color}; min-width: 24px;")
         percent.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
 
         capacity = QLabel("0.0M/0.0M")
-        capacity.setFont(QFont(FONT_FAMILY, FONT_SIZE_SMALL))
+        capacity.setFont(self._FONT_SMALL)
         capacity.setStyleSheet("color: #aaa; min-width: 48px;")
         capacity.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
 
@@ -29,6 +29,12 @@ class MainWindow(QWidget):
         layout.addWidget(self.monitor_panel)
         layout.addWidget(self.ai_panel)
         layout.addWidget(self.desktop_panel) # 添加到布局
+        # 面板 ID -> 面板实例，切换时直接查表
+        self._panels = {
+            self.PANEL_MONITOR: self.monitor_panel,
+            self.PANEL_AI: self.ai_panel,
+            self.PANEL_DESKTOP: self.desktop_panel,
+        }
         self.setLayout(layout)
         self.showFullScreen()
         self.setCursor(QCursor(Qt.CursorShape.BlankCursor))
@@ -38,17 +44,6 @@ class MainWindow(QWidget):
         logger.info(f"Switching UI to panel: {panel_id}")
         old_panel_id = self.layout().currentIndex() # Get the currently active panel ID
         self.layout().setCurrentIndex(panel_id)
-        # Notify old panel it's being left
-        if old_panel_id == self.PANEL_MONITOR:
-            self.monitor_panel.on_leave()
-        elif old_panel_id == self.PANEL_AI:
-            self.ai_panel.on_leave()
-        elif old_panel_id == self.PANEL_DESKTOP:
-            self.desktop_panel.on_leave()
-        # Notify new panel it's being entered
-        if panel_id == self.PANEL_MONITOR:
-            self.monitor_panel.on_enter()
-        elif panel_id == self.PANEL_AI:
-            self.ai_panel.on_enter()
-        elif panel_id == self.PANEL_DESKTOP:
-            self.desktop_panel.on_enter()
\ No newline at end of file
+        # Notify old panel it's being left, then the new one it's being entered
+        self._panels[old_panel_id].on_leave()
+        self._panels[panel_id].on_enter()
@@ -1,8 +1,8 @@
 # ui/panels/ai_panel.py
 """AI 聊天界面"""
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QFrame
-from PyQt6.QtCore import Qt, QTimer, pyqtSignal
-from PyQt6.QtGui import QFont, QPalette, QColor, QPixmap, QPainter
+from PyQt6.QtCore import Qt, QTimer, QRect, pyqtSignal
+from PyQt6.QtGui import QFont, QFontMetrics, QPalette, QColor, QPen, QPixmap, QPainter
 from ui.base import BasePanel
 import logging
 import os
@@ -35,6 +35,18 @@ class AIChatPanel(BasePanel):
         self.current_mouth_index = 0
         self.base_speaking_emoticon = self.EMO_SPEAKING_STATIC
         self.speaking_emoticon_with_mouth = self.base_speaking_emoticon
+        # 说话动画各帧预先生成，定时器只需按索引取
+        self._speaking_frames = tuple(self.base_speaking_emoticon.replace('_', c, 1) for c in self.MOUTH_SHAPES)
+        # 表情文本种类有限，绘制坐标按文本缓存
+        self._emoticon_font = QFont("DejaVu Sans Mono", 12, QFont.Weight.Bold)
+        # 直接缓存 QPen，setPen(QColor) 每次都会隐式构造一个临时 QPen
+        self._emoticon_pen = QPen(QColor("#00bcd4"))
+        self._emoticon_metrics = QFontMetrics(self._emoticon_font)
+        self._emoticon_pos_cache = {}
+        # 背景原图只从磁盘读取一次，容器尺寸变化时才重新缩放
+        self._background_orig = None
+        self._last_scaled_size = None
+        self.background_pixmap = None
         
         self.init_ui()
         self.set_emoticon(self.EMO_IDLE)
@@ -79,33 +91,44 @@ class AIChatPanel(BasePanel):
         self.load_background_image()
 
     def load_background_image(self):
-        """Load and scale the background image."""
+        """Load the background image and scale it to the container."""
         image_path = os.path.join('ui', 'assets', 'TA-TA.png')
+        self._background_orig = None
+        self._last_scaled_size = None
+        self.background_pixmap = None
         if os.path.exists(image_path):
             pixmap = QPixmap(image_path)
             if not pixmap.isNull():
-                # Scale pixmap to fit the container while keeping aspect ratio
-                scaled_pixmap = pixmap.scaled(
-                    self.container_widget.width(),
-                    self.container_widget.height(),
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation
-                )
-                self.background_pixmap = scaled_pixmap
+                self._background_orig = pixmap
+                self._rescale_background()
                 logger.info(f"Loaded and scaled background image: {image_path}")
             else:
                 logger.error(f"Failed to load image as pixmap: {image_path}")
-                self.background_pixmap = None
         else:
             logger.error(f"Background image file not found: {image_path}")
-            self.background_pixmap = None
+
+    def _rescale_background(self):
+        """Scale the cached background to the container, only when its size changed."""
+        if self._background_orig is None:
+            return False
+        size = self.container_widget.size()
+        if size == self._last_scaled_size:
+            return False
+        # Scale pixmap to fit the container while keeping aspect ratio
+        self.background_pixmap = self._background_orig.scaled(
+            size,
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation
+        )
+        self._last_scaled_size = size
+        return True
 
     def _container_paint_event(self, event):
         """Paint event for the container widget."""
         painter = QPainter(self.container_widget)
         
         # Draw background pixmap if available
-        if hasattr(self, 'background_pixmap') and self.background_pixmap:
+        if self.background_pixmap:
             # Center the pixmap in the container
             x_offset = (self.container_widget.width() - self.background_pixmap.width()) // 2
             y_offset = (self.container_widget.height() - self.background_pixmap.height()) // 2
@@ -113,37 +136,53 @@ class AIChatPanel(BasePanel):
             painter.drawPixmap(x_offset, y_offset, self.background_pixmap)
 
         # Draw centered emoticon on top
-        if hasattr(self, 'emoticon_text'):
-            painter.setPen(QColor("#00bcd4"))
-            font = QFont("DejaVu Sans Mono", 12, QFont.Weight.Bold)
-            painter.setFont(font)
-            # Calculate bounding rectangle for the text
-            fm = painter.fontMetrics()
-            text_width = fm.horizontalAdvance(self.emoticon_text)
+        if self.emoticon_text:
+            painter.setPen(self._emoticon_pen)
+            painter.setFont(self._emoticon_font)
+            text_x, text_baseline, _ = self._emoticon_position(self.emoticon_text)
+            painter.drawText(text_x, text_baseline, self.emoticon_text)
+
+    def _emoticon_position(self, text):
+        """Return the cached (x, baseline, dirty rect) that centers text in the container."""
+        width = self.container_widget.width()
+        height = self.container_widget.height()
+        key = (text, width, height)
+        pos = self._emoticon_pos_cache.get(key)
+        if pos is None:
+            fm = self._emoticon_metrics
             text_height = fm.height()
             # Center the text
-            text_x = (self.container_widget.width() - text_width) // 2
+            text_x = (width - fm.horizontalAdvance(text)) // 2
             # Use ascent to calculate baseline correctly for vertical centering
-            text_baseline = (self.container_widget.height() + text_height) // 2 - (text_height - fm.ascent()) // 2 - 2
-            painter.drawText(text_x, text_baseline, self.emoticon_text)
+            text_baseline = (height + text_height) // 2 - (text_height - fm.ascent()) // 2 - 2
+            # 文本实际占用区域（含字形外伸），用于局部重绘
+            rect = QRect(text_x, text_baseline - fm.ascent(), fm.horizontalAdvance(text), text_height)
+            rect = rect.united(fm.boundingRect(text).translated(text_x, text_baseline)).adjusted(-1, -1, 1, 1)
+            pos = (text_x, text_baseline, rect)
+            self._emoticon_pos_cache[key] = pos
+        return pos
 
     def resizeEvent(self, event):
         """Handle widget resize to adjust background image."""
         super().resizeEvent(event)
-        # Reload and rescale image when size changes
-        self.load_background_image()
-        if hasattr(self, 'container_widget'):
+        # Rescale the cached image only when the container size actually changed
+        if hasattr(self, 'container_widget') and self._rescale_background():
             self.container_widget.update()  # Trigger repaint
 
     def set_status(self, status_text):
         logger.debug(f"AI Panel status update request ignored (label removed): {status_text}")
 
     def set_emoticon(self, emoticon_text):
-        """Update the stored emoticon text and trigger a repaint."""
+        """Update the stored emoticon text and repaint only the area it covers."""
+        old_text = self.emoticon_text
         self.emoticon_text = emoticon_text
         logger.debug(f"AI Panel emoticon updated to: {emoticon_text}")
         if hasattr(self, 'container_widget'):
-            self.container_widget.update()  # Trigger repaint
+            # 只重绘新旧文本的并集区域，说话动画每帧仅改变一个字符
+            dirty = self._emoticon_position(emoticon_text)[2]
+            if old_text and old_text != emoticon_text:
+                dirty = dirty.united(self._emoticon_position(old_text)[2])
+            self.container_widget.update(dirty)
 
     def start_speaking_animation(self):
         logger.debug("Starting speaking animation.")
@@ -152,9 +191,7 @@ class AIChatPanel(BasePanel):
             return
 
         self.current_mouth_index = 0
-        mouth_char = self.MOUTH_SHAPES[self.current_mouth_index]
-        # Build emoticon without parentheses
-        self.speaking_emoticon_with_mouth = self.base_speaking_emoticon.replace('_', mouth_char, 1)
+        self.speaking_emoticon_with_mouth = self._speaking_frames[self.current_mouth_index]
         self.set_emoticon(self.speaking_emoticon_with_mouth)
 
         # Create new timer if needed
@@ -168,15 +205,13 @@ class AIChatPanel(BasePanel):
         if not self.animation_timer or not self.animation_timer.isActive():
             return
 
-        self.current_mouth_index = (self.current_mouth_index + 1) % len(self.MOUTH_SHAPES)
-        mouth_char = self.MOUTH_SHAPES[self.current_mouth_index]
-        # Build emoticon without parentheses
-        self.speaking_emoticon_with_mouth = self.base_speaking_emoticon.replace('_', mouth_char, 1)
+        self.current_mouth_index = (self.current_mouth_index + 1) % len(self._speaking_frames)
+        self.speaking_emoticon_with_mouth = self._speaking_frames[self.current_mouth_index]
         self.set_emoticon(self.speaking_emoticon_with_mouth)
 
     def stop_speaking_animation(self):
         logger.debug("Stopping speaking animation.")
-        if hasattr(self, 'animation_timer') and self.animation_timer:
+        if self.animation_timer:
             self.animation_timer.stop()
             # Don't delete the timer here since we reuse it
             # self.animation_timer.deleteLater()
@@ -2,37 +2,119 @@
 import sys
 import time
 import threading
-from collections import deque
+import zlib
+import numpy as np
 from PyQt6.QtWidgets import QLabel, QWidget, QVBoxLayout
 from PyQt6.QtGui import QPixmap, QImage
-from PyQt6.QtCore import QTimer, Qt, QThread, pyqtSignal
+from PyQt6.QtCore import QCoreApplication, QObject, QTimer, Qt, QThread, pyqtSignal, pyqtSlot
 import logging
 from ui.base import BasePanel
 from config import (
     DESKTOP_STREAM_IP,
     DESKTOP_STREAM_TCP_PORT,
     DESKTOP_STREAM_ZMQ_PORT,
-    DESKTOP_STREAM_BUFFER_SIZE,
-    DESKTOP_STREAM_TARGET_FPS,
     BRIGHTNESS_MIN
 )
 from services.zmq_stream_service import ZMQStreamService
 
 logger = logging.getLogger(__name__)
 
+class BlackFrameDetector(QObject):
+    """黑屏检测工作对象，运行在独立 QThread 中；只保留最新一帧待检测（单槽邮箱），旧帧直接丢弃"""
+    black_state_detected = pyqtSignal(bool)
+    _wake = pyqtSignal()
+
+    # 可直接抽样的像素格式及每像素字节数；32 位格式的前三个字节为颜色通道（BGRX/RGBA），顺序不影响黑色判断
+    _FORMAT_BPP = {
+        QImage.Format.Format_RGB32: 4,
+        QImage.Format.Format_ARGB32: 4,
+        QImage.Format.Format_RGBA8888: 4,
+        QImage.Format.Format_RGB888: 3,
+        QImage.Format.Format_RGB16: 2,
+        QImage.Format.Format_Grayscale8: 1,
+    }
+
+    def __init__(self, sample_step, threshold, ratio):
+        super().__init__()
+        self.sample_step = sample_step
+        self.threshold = threshold
+        self.ratio = ratio
+        self._lock = threading.Lock()
+        self._pending = None
+        # 帧尺寸固定，抽样点数与判定所需的暗点数按尺寸缓存
+        self._sample_size = None
+        self._required_dark = 0
+        # 上次检测帧的压缩数据 CRC 及结果，仅在本线程访问
+        self._last_digest = None
+        self._last_result = False
+
+    def submit(self, qimage, payload):
+        """GUI 线程调用：放入待检测帧及其压缩数据，仅在邮箱为空时唤醒工作线程"""
+        with self._lock:
+            idle = self._pending is None
+            self._pending = (qimage, payload)
+        if idle:
+            self._wake.emit()
+
+    @pyqtSlot()
+    def _process(self):
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        qimage, payload = pending
+        # 只对送检的帧计算 CRC（JPEG 头部每帧相同，不能只取前缀）；压缩数据未变时沿用上次结果
+        digest = zlib.crc32(payload)
+        if digest != self._last_digest:
+            self._last_digest = digest
+            self._last_result = self._is_black(qimage)
+        self.black_state_detected.emit(self._last_result)
+
+    def _is_black(self, qimage):
+        width = qimage.width()
+        height = qimage.height()
+        step = self.sample_step
+        if self._sample_size != (width, height):
+            self._sample_size = (width, height)
+            samples_total = (-(-width // step)) * (-(-height // step))
+            self._required_dark = int(samples_total * self.ratio)
+        fmt = qimage.format()
+        if fmt not in self._FORMAT_BPP:
+            # 少见格式才整帧转换
+            qimage = qimage.convertToFormat(QImage.Format.Format_RGB32)
+            fmt = QImage.Format.Format_RGB32
+        # 直接映射源像素缓冲，按步长抽样后用 NumPy 向量化判断，不生成转换后的中间图
+        ptr = qimage.constBits()
+        ptr.setsize(qimage.sizeInBytes())
+        bpp = self._FORMAT_BPP[fmt]
+        if bpp == 2:
+            # RGB565：各通道展开到 8 位后再与阈值比较
+            pixels = np.frombuffer(ptr, np.uint16).reshape(height, qimage.bytesPerLine() // 2)
+            samples = pixels[::step, :width:step]
+            dark = (((samples >> 8) & 0xF8) <= self.threshold) \
+                & (((samples >> 3) & 0xFC) <= self.threshold) \
+                & (((samples << 3) & 0xF8) <= self.threshold)
+        else:
+            rows = np.frombuffer(ptr, np.uint8).reshape(height, qimage.bytesPerLine())[::step, :width * bpp]
+            samples = rows.reshape(rows.shape[0], width, bpp)[:, ::step, :3]
+            # 取各通道最大值作保守亮度，只需一次比较
+            dark = samples.max(axis=2) <= self.threshold
+        return np.count_nonzero(dark) >= self._required_dark
+
 class DesktopStreamPanel(BasePanel):
     def __init__(self, state_manager=None):
         super().__init__()
         self.state_manager = state_manager
         self.init_ui()
         self.client = None
-        self.render_buffer = deque(maxlen=DESKTOP_STREAM_BUFFER_SIZE)
-        self.render_timer = None
-        self.render_interval_ms = int(1000 / DESKTOP_STREAM_TARGET_FPS)
+        # 实时流只显示最新帧，单槽保存待渲染的 QPixmap
+        self._latest_pixmap = None
+        self.status_timer = None
         self.active = False
         self.rendered_frame_count = 0
-        self.render_fps_start_time = time.time()
+        self._render_fps_start_ns = time.monotonic_ns()
         self.stats_timer = None
+        self._backlight_mgr = None
         # Overlay for connection status
         self.status_overlay = QLabel()
         overlay_font = self.status_overlay.font()
@@ -43,8 +125,13 @@ class DesktopStreamPanel(BasePanel):
         self.status_overlay.setParent(self)
         self.status_overlay.setGeometry(8, 36, 144, 56)
         self.status_overlay.hide()
+        self._overlay_text_cache = ""
+        self._overlay_visible_cache = False
         # Cache for connection status
         self._last_conn_status_shown = None
+        # 地址端口为常量，两种提示文本只生成一次
+        self._status_connecting = f"Desktop Stream\nStatus: Connecting...\nTarget: {DESKTOP_STREAM_IP}\nTCP:{DESKTOP_STREAM_TCP_PORT} ZMQ:{DESKTOP_STREAM_ZMQ_PORT}"
+        self._status_error = f"Desktop Stream\nStatus: Connection Error\nTarget: {DESKTOP_STREAM_IP}\nTCP:{DESKTOP_STREAM_TCP_PORT} ZMQ:{DESKTOP_STREAM_ZMQ_PORT}"
         # Black Screen Detection
         self._last_black_screen_state = False
         self._black_detection_sample_step = 8
@@ -52,6 +139,18 @@ class DesktopStreamPanel(BasePanel):
         self._black_detection_ratio = 0.95
         self._black_detection_frame_counter = 0 # Counter for interval detection
         self._black_detection_interval = 5 # Check every N frames
+        self._black_detect_thread = QThread(self)
+        self._black_detector = BlackFrameDetector(
+            self._black_detection_sample_step,
+            self._black_detection_threshold,
+            self._black_detection_ratio
+        )
+        self._black_detector.moveToThread(self._black_detect_thread)
+        self._black_detector._wake.connect(self._black_detector._process)
+        self._black_detector.black_state_detected.connect(self._on_black_state_detected)
+        self._black_detect_thread.start()
+        # 面板随程序存活，退出事件循环前停止检测线程
+        QCoreApplication.instance().aboutToQuit.connect(self._stop_black_detector)
 
     def init_ui(self):
         layout = QVBoxLayout()
@@ -70,56 +169,34 @@ class DesktopStreamPanel(BasePanel):
             return self.state_manager.backlight_manager
         return None
 
-    def _check_if_frame_is_black(self, qimage):
-        width = qimage.width()
-        height = qimage.height()
-        step = self._black_detection_sample_step
-        threshold = self._black_detection_threshold
-        required_pixels = int((width // step) * (height // step) * self._black_detection_ratio)
-
-        black_pixel_count = 0
-        total_samples = 0
-
-        for x in range(0, width, step):
-            for y in range(0, height, step):
-                pixel_color = qimage.pixelColor(x, y)
-                if (pixel_color.red() <= threshold and
-                    pixel_color.green() <= threshold and
-                    pixel_color.blue() <= threshold):
-                    black_pixel_count += 1
-                total_samples += 1
-                if black_pixel_count >= required_pixels:
-                    return True
-
-        return black_pixel_count >= required_pixels
-
     def on_enter(self):
         logger.info("Activated, initializing resources.")
         self.active = True
         self.video_label.clear()
-        self.render_buffer.clear()
+        self._latest_pixmap = None
         self.rendered_frame_count = 0
-        self.render_fps_start_time = time.time()
-        self.buffer_len_count = 0
+        self._render_fps_start_ns = time.monotonic_ns()
         self._last_conn_status_shown = None
         self._last_black_screen_state = False
         self._black_detection_frame_counter = 0 # Reset counter when panel becomes active
-        backlight_mgr = self._get_backlight_manager()
-        if backlight_mgr:
-            backlight_mgr.request_keep_screen_on()
+        # 激活期间背光管理器不变，进入时解析一次
+        self._backlight_mgr = self._get_backlight_manager()
+        if self._backlight_mgr:
+            self._backlight_mgr.request_keep_screen_on()
         self.client = ZMQStreamService(
             tcp_ip=DESKTOP_STREAM_IP,
             tcp_port=DESKTOP_STREAM_TCP_PORT,
             zmq_port=DESKTOP_STREAM_ZMQ_PORT,
             target_size=(160, 128)
         )
-        # Connect signals from the client service to local slots
-        self.client.frame_decoded.connect(self.on_decoded_pixmap)
-        self.client.connection_status_changed.connect(self.on_connection_status_change) # Connect the client's signal to this panel's slot
+        # 信号由 TCP/解码线程发出，显式排队到 GUI 线程；frame_ready 不带帧数据，由 render_frame 通过 take_frame() 拉取
+        self.client.connection_status_changed.connect(self.on_connection_status_change, Qt.ConnectionType.QueuedConnection)
+        self.client.frame_ready.connect(self.render_frame, Qt.ConnectionType.QueuedConnection)
         self.client.connect()
-        self.render_timer = QTimer(self)
-        self.render_timer.timeout.connect(self.render_frame)
-        self.render_timer.start(self.render_interval_ms)
+        # 有新帧时才渲染，定时器只负责刷新连接状态提示
+        self.status_timer = QTimer(self)
+        self.status_timer.timeout.connect(self._refresh_status_overlay)
+        self.status_timer.start(500)
         self.stats_timer = QTimer(self)
         self.stats_timer.timeout.connect(self._log_stats)
         self.stats_timer.start(10000)
@@ -128,37 +205,39 @@ class DesktopStreamPanel(BasePanel):
     def on_leave(self):
         logger.info("Deactivated, releasing resources.")
         self.active = False
-        if self.render_timer:
-            self.render_timer.stop()
-            self.render_timer.deleteLater()
-            self.render_timer = None
+        if self.status_timer:
+            self.status_timer.stop()
+            self.status_timer.deleteLater()
+            self.status_timer = None
         if self.stats_timer:
             self.stats_timer.stop()
             self.stats_timer.deleteLater()
             self.stats_timer = None
         if self.client:
             self.client.disconnect()
-            try:
-                self.client.frame_decoded.disconnect(self.on_decoded_pixmap)
-            except TypeError:
-                pass
             try:
                 self.client.connection_status_changed.disconnect(self.on_connection_status_change) # Disconnect the signal
+                self.client.frame_ready.disconnect(self.render_frame)
             except TypeError:
                 pass
             self.client = None
-        self.render_buffer.clear()
+        self._latest_pixmap = None
         self.video_label.clear()
         self.status_overlay.hide()
+        self._overlay_visible_cache = False
         self._last_conn_status_shown = None
         self._last_black_screen_state = False
-        backlight_mgr = self._get_backlight_manager()
-        if backlight_mgr:
-            backlight_mgr.release_keep_screen_on()
+        if self._backlight_mgr:
+            self._backlight_mgr.release_keep_screen_on()
+            self._backlight_mgr = None
 
     def _update_status_overlay(self, message, visible):
-        if self.status_overlay.text() != message or self.status_overlay.isVisible() != visible:
-            self.status_overlay.setText(message)
+        # 与 Python 侧缓存比较，避免每次都从 Qt 取回 QString
+        if self._overlay_text_cache != message or self._overlay_visible_cache != visible:
+            if self._overlay_text_cache != message:
+                self.status_overlay.setText(message)
+                self._overlay_text_cache = message
+            self._overlay_visible_cache = visible
             if visible:
                 self.status_overlay.show()
             else:
@@ -169,49 +248,47 @@ class DesktopStreamPanel(BasePanel):
             self._update_status_overlay("", False)
             self._last_conn_status_shown = ("connected", "")
 
-    def on_decoded_pixmap(self, pixmap):
+    def on_decoded_pixmap(self, pixmap, image, payload):
         if self.active:
-            self.render_buffer.append(pixmap)
+            self._latest_pixmap = pixmap
             self._black_detection_frame_counter += 1
             if self._black_detection_frame_counter >= self._black_detection_interval:
                 self._black_detection_frame_counter = 0 # Reset counter
-                qimage = pixmap.toImage()
-                if qimage.format() in [QImage.Format.Format_RGB32, QImage.Format.Format_ARGB32, QImage.Format.Format_RGBA8888]:
-                     current_black_state = self._check_if_frame_is_black(qimage)
+                # 直接使用解码得到的 QImage，免去 pixmap.toImage() 回读，CRC 与像素判断交给检测线程
+                self._black_detector.submit(image, payload)
+
+    def _on_black_state_detected(self, current_black_state):
+        if not self.active or current_black_state == self._last_black_screen_state:
+            return
+        logger.debug(f"Black screen state changed to: {current_black_state}")
+        backlight_mgr = self._backlight_mgr
+        if backlight_mgr:
+            if current_black_state:
+                logger.info("Detected black screen, lowering backlight.")
+                if hasattr(backlight_mgr, 'set_brightness'):
+                    backlight_mgr.set_brightness(BRIGHTNESS_MIN)
                 else:
-                    qimage = qimage.convertToFormat(QImage.Format.Format_RGB32)
-                    current_black_state = self._check_if_frame_is_black(qimage)
-
-                if current_black_state != self._last_black_screen_state:
-                     logger.debug(f"Black screen state changed to: {current_black_state}")
-                     backlight_mgr = self._get_backlight_manager()
-                     if backlight_mgr:
-                         if current_black_state:
-                             logger.info("Detected black screen, lowering backlight.")
-                             if hasattr(backlight_mgr, 'set_brightness'):
-                                 backlight_mgr.set_brightness(BRIGHTNESS_MIN)
-                             else:
-                                 logger.warning("BacklightManager object does not have set_brightness method.")
-                         else:
-                             logger.info("Black screen ended, restoring backlight.")
-                             backlight_mgr.request_keep_screen_on()
-                     self._last_black_screen_state = current_black_state
+                    logger.warning("BacklightManager object does not have set_brightness method.")
+            else:
+                logger.info("Black screen ended, restoring backlight.")
+                backlight_mgr.request_keep_screen_on()
+        self._last_black_screen_state = current_black_state
 
     def render_frame(self):
-        if self.active and self.render_timer:
-            buf_len = len(self.render_buffer)
-            self.buffer_len_count += buf_len
-            if buf_len >= 1:
-                pixmap = self.render_buffer.popleft()
+        if self.active and self.client:
+            frame = self.client.take_frame()
+            if frame:
+                self.on_decoded_pixmap(*frame)
+            pixmap = self._latest_pixmap
+            if pixmap is not None:
+                self._latest_pixmap = None
                 self.video_label.setPixmap(pixmap)
                 self.rendered_frame_count += 1
 
+    def _refresh_status_overlay(self):
         # Check client connection status for UI overlay, only if panel is active
         if self.client and not self.client._tcp_connected and self.active:
-            if self.client._zmq_initialized:
-                current_status_str = f"Desktop Stream\nStatus: Connection Error\nTarget: {DESKTOP_STREAM_IP}\nTCP:{DESKTOP_STREAM_TCP_PORT} ZMQ:{DESKTOP_STREAM_ZMQ_PORT}"
-            else:
-                current_status_str = f"Desktop Stream\nStatus: Connecting...\nTarget: {DESKTOP_STREAM_IP}\nTCP:{DESKTOP_STREAM_TCP_PORT} ZMQ:{DESKTOP_STREAM_ZMQ_PORT}"
+            current_status_str = self._status_error if self.client._zmq_initialized else self._status_connecting
 
             if self._last_conn_status_shown != ("connecting_tcp_ok_zmq_not", current_status_str):
                 self._update_status_overlay(current_status_str, True)
@@ -225,18 +302,20 @@ class DesktopStreamPanel(BasePanel):
         if not self.active:
             logger.debug("Stats timer fired, but panel is inactive. Skipping log.")
             return
-        current_time = time.time()
-        duration = current_time - self.render_fps_start_time
-        render_fps = (self.rendered_frame_count / duration) if duration > 0 else 0
-        buffer_avg_size = (self.buffer_len_count / self.rendered_frame_count) if self.rendered_frame_count != 0 else 0
-
-        logger.info(f"Desktop Panel Render FPS: {render_fps:.1f}, Buf Avg: {buffer_avg_size:.1f}({buffer_avg_size/DESKTOP_STREAM_BUFFER_SIZE:.0%})")
+        now_ns = time.monotonic_ns()
+        render_fps = self.rendered_frame_count * 1_000_000_000 / max(now_ns - self._render_fps_start_ns, 1)
+        # 丢帧数由 ZMQ 服务统计（批量读取只解码最新一条），这里只记录渲染帧率
+        logger.info(f"Desktop Panel Render FPS: {render_fps:.1f}")
         self.rendered_frame_count = 0
-        self.buffer_len_count = 0
-        self.buffer_under_run_count = 0
-        self.render_fps_start_time = current_time
+        self._render_fps_start_ns = now_ns
 
     def closeEvent(self, event):
         if self.active:
             self.on_leave()
+        self._stop_black_detector()
         super().closeEvent(event)
+
+    def _stop_black_detector(self):
+        if self._black_detect_thread.isRunning():
+            self._black_detect_thread.quit()
+            self._black_detect_thread.wait()
@@ -9,11 +9,24 @@ import ctypes
 from ctypes import wintypes
 import time
 import socket
+import selectors
 import threading
+import queue
 import argparse
+from contextlib import contextmanager
+from functools import partial
 import winreg
 import zmq # 引入 ZMQ
 import logging # 引入 logging
+import zlib
+try:
+    import dxcam # DXGI Desktop Duplication 捕获，不可用时退回 mss
+except ImportError:
+    dxcam = None
+try:
+    import simplejpeg # 直接调用 libjpeg-turbo，不可用时退回 cv2.imencode
+except ImportError:
+    simplejpeg = None
 
 # --- 配置日志 ---
 logger = logging.getLogger(__name__)
@@ -32,13 +45,95 @@ from PyQt6.QtWidgets import (
     QSizePolicy, QMessageBox
 )
 from PyQt6.QtGui import QAction, QIcon, QPixmap, QImage, QCursor
-from PyQt6.QtCore import QTimer, Qt, pyqtSignal, QObject
+from PyQt6.QtCore import QTimer, Qt, pyqtSignal, QObject, QWinEventNotifier
+
+# ===== Win32 光标查询 =====
+class POINT(ctypes.Structure):
+    _fields_ = [("x", wintypes.LONG), ("y", wintypes.LONG)]
+
+# 预先取得函数指针并声明参数类型，避免每帧属性查找和参数推断
+_GetCursorPos = ctypes.windll.user32.GetCursorPos
+_GetCursorPos.argtypes = [ctypes.POINTER(POINT)]
+_GetCursorPos.restype = wintypes.BOOL
+
+# 系统定时器精度（timeBeginPeriod 会提高全系统的时钟中断频率，退出捕获时须配对调用 timeEndPeriod）
+_winmm = ctypes.windll.winmm
+TIMER_RESOLUTION_MS = 1
+
+# ===== 应用图标 =====
+_APP_ICON = None
+
+def _get_app_icon():
+    """主题图标查找需遍历图标主题目录，结果在进程内缓存"""
+    global _APP_ICON
+    if _APP_ICON is None:
+        icon = QIcon.fromTheme("video-display")
+        if icon.isNull():
+            icon = QIcon.fromTheme("computer")
+        _APP_ICON = icon
+    return _APP_ICON
+
+# ===== 程序路径 =====
+# 进程生命周期内不变，导入时计算一次供 main() 与 MainWindow 共用
+IS_FROZEN = bool(getattr(sys, 'frozen', False))
+if IS_FROZEN:
+    # PyInstaller 打包版本
+    EXE_PATH = sys.executable
+else:
+    # 开发版本：当前脚本路径
+    EXE_PATH = os.path.abspath(__file__)
+APPLICATION_PATH = os.path.dirname(EXE_PATH)
+
+# ===== 开机自启 =====
+RUN_PATH = r"Software\Microsoft\Windows\CurrentVersion\Run"
+
+# Run 键变化通知：注册后由内核在值被修改时置位事件，无需轮询注册表
+REG_NOTIFY_CHANGE_LAST_SET = 0x00000004
+_CreateEventW = ctypes.windll.kernel32.CreateEventW
+_CreateEventW.argtypes = [wintypes.LPVOID, wintypes.BOOL, wintypes.BOOL, wintypes.LPCWSTR]
+_CreateEventW.restype = wintypes.HANDLE
+_RegNotifyChangeKeyValue = ctypes.windll.advapi32.RegNotifyChangeKeyValue
+_RegNotifyChangeKeyValue.argtypes = [wintypes.HKEY, wintypes.BOOL, wintypes.DWORD, wintypes.HANDLE, wintypes.BOOL]
+_RegNotifyChangeKeyValue.restype = wintypes.LONG
+
+@contextmanager
+def open_run_key(access):
+    """打开 HKCU 下的 Run 键，退出时保证 CloseKey（异常路径也不泄漏句柄）"""
+    key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, RUN_PATH, 0, access)
+    try:
+        yield key
+    finally:
+        winreg.CloseKey(key)
+
+# 单值写入/删除：RegSetKeyValueW / RegDeleteKeyValueW 在一次调用内完成打开、修改、关闭
+_RegSetKeyValueW = ctypes.windll.advapi32.RegSetKeyValueW
+_RegSetKeyValueW.argtypes = [wintypes.HKEY, wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.DWORD, wintypes.LPCVOID, wintypes.DWORD]
+_RegSetKeyValueW.restype = wintypes.LONG
+_RegDeleteKeyValueW = ctypes.windll.advapi32.RegDeleteKeyValueW
+_RegDeleteKeyValueW.argtypes = [wintypes.HKEY, wintypes.LPCWSTR, wintypes.LPCWSTR]
+_RegDeleteKeyValueW.restype = wintypes.LONG
+ERROR_FILE_NOT_FOUND = 2
+
+def set_run_value(name, command):
+    """写入 Run 键下的 REG_SZ 值"""
+    rc = _RegSetKeyValueW(winreg.HKEY_CURRENT_USER, RUN_PATH, name, winreg.REG_SZ,
+                          command, (len(command) + 1) * ctypes.sizeof(wintypes.WCHAR))
+    if rc != 0:
+        raise ctypes.WinError(rc)
+
+def delete_run_value(name):
+    """删除 Run 键下的值，不存在时抛出 FileNotFoundError（与 winreg.DeleteValue 一致）"""
+    rc = _RegDeleteKeyValueW(winreg.HKEY_CURRENT_USER, RUN_PATH, name)
+    if rc == ERROR_FILE_NOT_FOUND:
+        raise FileNotFoundError(name)
+    if rc != 0:
+        raise ctypes.WinError(rc)
 
 # ===== 配置 =====
 CONFIG_FILE = "config.json"
 DEFAULT_CONFIG = {
     "monitor_idx": 4,
-    "target_resolution": [160, 128],
+    "target_resolution": (160, 128),
     "jpeg_quality": 10,
     "zmq_port": 5555,
     "tcp_port": 5655,
@@ -48,6 +143,12 @@ DEFAULT_CONFIG = {
     "webp_quality": 10
 }
 
+# 影响编码器的配置项，变化时重建编码函数
+ENCODER_CONFIG_KEYS = ('encoding_format', 'jpeg_quality', 'png_compression', 'webp_quality', 'target_fps')
+# 目标帧率高于该值时 PNG 压缩级别上限为 PNG_STREAM_MAX_COMPRESSION，否则 zlib 编码跟不上帧率
+PNG_STREAM_FPS_LIMIT = 10
+PNG_STREAM_MAX_COMPRESSION = 3
+
 def parse_args():
     """解析启动参数"""
     parser = argparse.ArgumentParser()
@@ -55,8 +156,11 @@ def parse_args():
                        help='静默启动模式，可选延迟秒数')
     return parser.parse_args()
 
-class ConfigManager:
+class ConfigManager(QObject):
+    config_changed = pyqtSignal(str)
+
     def __init__(self):
+        super().__init__()
         self.config = DEFAULT_CONFIG.copy()
         self.load()
 
@@ -67,6 +171,8 @@ class ConfigManager:
                     self.config.update(json.load(f))
             except:
                 pass
+        # JSON 中为列表，cv2.resize 需要元组
+        self.config['target_resolution'] = tuple(self.config['target_resolution'])
 
     def save(self):
         try:
@@ -78,6 +184,7 @@ class ConfigManager:
     def update_and_save(self, key, value):
         self.config[key] = value
         self.save()
+        self.config_changed.emit(key)
 
 class ConnectionChecker(QObject):
     """TCP 连接检测器"""
@@ -99,62 +206,123 @@ class ConnectionChecker(QObject):
         self.thread.start()
 
     def stop_checking(self):
+        self.request_stop()
+        self.wait_stopped()
+
+    def request_stop(self):
+        """只置停止标志，不等待线程退出"""
         self.running = False
 
+    def wait_stopped(self, timeout=2.0):
+        """等待检测线程退出（select 超时为 1 秒）"""
+        thread = getattr(self, 'thread', None)
+        if thread is not None:
+            thread.join(timeout)
+
     def _check_loop(self):
         server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         try:
             server_socket.bind(('0.0.0.0', self.port))
             server_socket.listen(5)
-            server_socket.settimeout(1.0)
+            server_socket.setblocking(False)
         except Exception as e:
             logger.error(f"TCP 服务器启动失败: {e}")
             return
 
+        # 单线程 selector 处理监听套接字和所有客户端的握手/心跳，不再每个客户端一个线程
+        sel = selectors.DefaultSelector()
+        sel.register(server_socket, selectors.EVENT_READ, None)
+
         while self.running:
             try:
-                conn, addr = server_socket.accept()
-                with self.lock:
-                    self.clients[addr] = time.time()
-                    self.client_sockets[addr] = conn
-
-                try:
-                    handshake = conn.recv(1024).decode()
-                    if handshake == "client_connected":
-                        conn.send(b"connected")
-                except:
-                    pass
-
-                hb_thread = threading.Thread(target=self._heartbeat_check, args=(addr, conn), daemon=True)
-                hb_thread.start()
-
-            except socket.timeout:
-                continue
+                events = sel.select(timeout=1.0)
             except Exception as e:
                 logger.error(f"TCP 服务器错误: {e}")
                 break
 
+            for key, _ in events:
+                if key.data is None:
+                    self._accept_client(sel, server_socket)
+                else:
+                    self._read_client(sel, key)
+
+            self._drop_stale_clients(sel)
+
+        for key in list(sel.get_map().values()):
+            if key.data is not None:
+                self._close_client(sel, key.fileobj, key.data)
+        sel.close()
         server_socket.close()
 
-    def _heartbeat_check(self, addr, conn):
-        while self.running and addr in self.clients:
-            try:
-                conn.settimeout(5.0)
-                data = conn.recv(1024)
-                if data == b"hb":
-                    with self.lock:
-                        self.clients[addr] = time.time()
-                else:
-                    break
-            except:
-                with self.lock:
-                    if addr in self.clients:
-                        del self.clients[addr]
-                        if addr in self.client_sockets:
-                            del self.client_sockets[addr]
-                break
+    def _accept_client(self, sel, server_socket):
+        try:
+            conn, addr = server_socket.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        except Exception as e:
+            logger.error(f"TCP 接受连接失败: {e}")
+            return
+        conn.setblocking(False)
+        with self.lock:
+            self.clients[addr] = time.time()
+            self.client_sockets[addr] = conn
+        # data: [地址, 是否已握手, 最近一次收到数据的时间]
+        sel.register(conn, selectors.EVENT_READ, [addr, False, time.time()])
+
+    def _read_client(self, sel, key):
+        conn = key.fileobj
+        state = key.data
+        addr = state[0]
+        try:
+            data = conn.recv(1024)
+        except (BlockingIOError, InterruptedError):
+            return
+        except Exception:
+            data = b""
+
+        if not state[1]:
+            # 首个报文为握手，无论内容如何之后都进入心跳阶段
+            state[1] = True
+            state[2] = time.time()
+            if data == b"client_connected":
+                try:
+                    conn.send(b"connected")
+                except Exception:
+                    pass
+            elif not data:
+                self._close_client(sel, conn, state)
+            return
+
+        if data == b"hb":
+            state[2] = time.time()
+            with self.lock:
+                if addr in self.clients:
+                    self.clients[addr] = state[2]
+        else:
+            self._close_client(sel, conn, state)
 
+    def _drop_stale_clients(self, sel):
+        """关闭 5 秒内无数据或已被判定过期的客户端"""
+        now = time.time()
+        with self.lock:
+            alive = set(self.clients)
+        for key in list(sel.get_map().values()):
+            state = key.data
+            if state is not None and (now - state[2] > 5.0 or state[0] not in alive):
+                self._close_client(sel, key.fileobj, state)
+
+    def _close_client(self, sel, conn, state):
+        addr = state[0]
+        with self.lock:
+            if addr in self.clients:
+                del self.clients[addr]
+            if addr in self.client_sockets:
+                del self.client_sockets[addr]
+        try:
+            sel.unregister(conn)
+        except Exception:
+            pass
         try:
             conn.close()
         except:
@@ -196,6 +364,16 @@ class CaptureWorker(QObject):
         # 帧变化检测
         self.last_frame_hash = None
         self.frame_skip_count = 0
+        self._sct = None # 工作线程内的 mss 实例
+        self._use_opencl = False
+        self._encoder = None # (格式前缀, 编码函数)
+        self._rebuild_encoder()
+        self.config_mgr.config_changed.connect(self._rebuild_encoder)
+        self._pt = POINT() # GetCursorPos 复用的输出结构
+        self._cursor_templates = {} # 指针尺寸 -> (多边形, 最小坐标, 最大坐标)
+        # 捕获线程与编码发送线程之间的单槽队列，满时以新帧替换旧帧
+        self._send_queue = queue.Queue(maxsize=1)
+        self.last_payload = None # 最近发送的 (格式, 编码数据)，画面无变化时用于定期重发
 
         # 动态帧率
         self.current_fps = self.config_mgr.config['target_fps']
@@ -203,6 +381,7 @@ class CaptureWorker(QObject):
 
         # --- CurveZMQ 密钥生成与存储 ---
         self.zmq_secret_key_file = "server_secret.key"
+        self.zmq_public_key_file = "server_public.key"
         self.zmq_public_key, self.zmq_secret_key = self._load_or_generate_curve_keys()
 
     def _load_or_generate_curve_keys(self):
@@ -212,9 +391,14 @@ class CaptureWorker(QObject):
             try:
                 with open(self.zmq_secret_key_file, 'rb') as f:
                     secret_key = f.read()
-                    # 从私钥推导出公钥
+                # 优先读取已保存的公钥，缺失时才从私钥推导（Curve25519 标量乘法）
+                if os.path.exists(self.zmq_public_key_file):
+                    with open(self.zmq_public_key_file, 'rb') as f:
+                        public_key = f.read()
+                else:
                     public_key = zmq.curve_public(secret_key)
-                    return public_key, secret_key
+                    self._save_public_key(public_key)
+                return public_key, secret_key
             except Exception as e:
                 logger.error(f"Failed to load ZMQ secret key: {e}. Generating new pair.")
 
@@ -230,16 +414,19 @@ class CaptureWorker(QObject):
         except Exception as e:
             logger.error(f"Failed to save ZMQ secret key: {e}")
 
-        # 保存公钥到文件 (可选，方便客户端获取)
+        # 保存公钥到文件 (方便客户端获取，下次启动也直接读取)
+        self._save_public_key(public_key)
+
+        return public_key, secret_key
+
+    def _save_public_key(self, public_key):
         try:
-            with open("server_public.key", 'wb') as f:
+            with open(self.zmq_public_key_file, 'wb') as f:
                 f.write(public_key)
-            logger.info(f"ZMQ public key saved to server_public.key.")
+            logger.info(f"ZMQ public key saved to {self.zmq_public_key_file}.")
         except Exception as e:
             logger.error(f"Failed to save ZMQ public key: {e}")
 
-        return public_key, secret_key
-
 
     def start_worker(self):
         if self.running:
@@ -247,18 +434,165 @@ class CaptureWorker(QObject):
         self.running = True
         self.thread = threading.Thread(target=self._worker_loop, daemon=True)
         self.thread.start()
+        self.send_thread = threading.Thread(target=self._send_loop, daemon=True)
+        self.send_thread.start()
 
     def stop_worker(self):
+        self.request_stop()
+        self.wait_stopped()
+
+    def request_stop(self):
+        """只置停止标志，不等待线程退出"""
         self.running = False
 
+    def wait_stopped(self, timeout=2.0):
+        """等待捕获线程与发送线程退出；两者互不依赖，共用同一截止时间"""
+        deadline = time.perf_counter() + timeout
+        for thread in (getattr(self, 'thread', None), getattr(self, 'send_thread', None)):
+            if thread is not None:
+                thread.join(max(deadline - time.perf_counter(), 0))
+
     def set_capture_state(self, capture_enabled, monitor_idx=None):
         with self.capture_lock:
             self.capture_enabled = capture_enabled
             if monitor_idx is not None:
                 self.current_monitor = monitor_idx
 
-    def _worker_loop(self):
-        import zmq
+    def _open_dxcam(self, monitor_idx):
+        """为指定显示器创建 DXGI 捕获对象，不可用时返回 None（如多会话 RDP）
+
+        dxcam.create 按 (显卡, 输出) 缓存实例，release 后再次 create 拿到的是同一个已释放对象，
+        因此每个显示器只创建一次，由调用方保存到退出。
+        """
+        if dxcam is None:
+            return None
+        # mss 的 0 号是所有显示器拼接的虚拟屏，DXGI 没有对应输出
+        output_idx = monitor_idx - 1
+        try:
+            # dxcam 只提供文本形式的输出列表，统计 0 号显卡上的输出数
+            output_count = sum(1 for line in dxcam.output_info().splitlines() if line.startswith("Device[0]"))
+        except Exception as e:
+            logger.warning(f"无法获取 DXGI 输出列表，使用 GDI: {e}")
+            return None
+        if not 0 <= output_idx < output_count:
+            logger.info(f"显示器 {monitor_idx} 没有对应的 DXGI 输出，使用 GDI")
+            return None
+        try:
+            return dxcam.create(output_idx=output_idx, output_color="BGR")
+        except Exception as e:
+            logger.warning(f"DXGI 捕获不可用，使用 GDI: {e}")
+            return None
+
+    @staticmethod
+    def _dxcam_matches(camera, mon, frame):
+        """检查 DXGI 输出与 mss 显示器是否为同一块屏幕：分辨率一致，且能取到桌面坐标时位置也一致"""
+        if frame.shape[:2] != (mon["height"], mon["width"]):
+            return False
+        # dxcam 未公开输出的桌面坐标，取不到时只按分辨率判断
+        desc = getattr(getattr(camera, "_output", None), "desc", None)
+        rect = getattr(desc, "DesktopCoordinates", None)
+        if rect is not None and (rect.left, rect.top) != (mon["left"], mon["top"]):
+            return False
+        return True
+
+    def _rebuild_encoder(self, key=None):
+        """按当前配置生成编码函数，热循环中直接调用，不再逐帧比较格式字符串"""
+        if key is not None and key not in ENCODER_CONFIG_KEYS:
+            return
+        cfg = self.config_mgr.config
+        encoding_format = cfg['encoding_format']
+        if encoding_format == 'png':
+            compression = cfg['png_compression']
+            if cfg['target_fps'] > PNG_STREAM_FPS_LIMIT:
+                compression = min(compression, PNG_STREAM_MAX_COMPRESSION)
+            # RLE 策略对屏幕内容（大片纯色）压缩效果好，且比默认策略快得多
+            encode = partial(cv2.imencode, '.png', params=[
+                cv2.IMWRITE_PNG_COMPRESSION, compression,
+                cv2.IMWRITE_PNG_STRATEGY, cv2.IMWRITE_PNG_STRATEGY_RLE
+            ])
+        elif encoding_format == 'webp':
+            encode = partial(cv2.imencode, '.webp', params=[cv2.IMWRITE_WEBP_QUALITY, cfg['webp_quality'] * 10])
+        else:
+            # 未知格式按 JPG 编码，前缀也标记为 jpg 以便客户端解码
+            encoding_format = 'jpg'
+            quality = cfg['jpeg_quality'] * 10
+            if simplejpeg is not None:
+                encode = partial(self._encode_simplejpeg, quality=quality)
+            else:
+                encode = partial(cv2.imencode, '.jpg', params=self._jpeg_params(quality))
+        # 前缀与编码函数作为一个元组整体替换，工作线程读取时不会拿到不一致的组合
+        self._encoder = (encoding_format.encode(), encode)
+
+    @staticmethod
+    def _encode_simplejpeg(img_bgr, quality):
+        """simplejpeg 编码，返回与 cv2.imencode 相同的 (success, data) 形式"""
+        # fastdct 使用整数 DCT，速度更快
+        return True, simplejpeg.encode_jpeg(
+            np.ascontiguousarray(img_bgr), quality=quality, colorspace='BGR',
+            colorsubsampling='420', fastdct=True
+        )
+
+    @staticmethod
+    def _jpeg_params(quality):
+        """cv2 JPEG 参数：关闭 Huffman 优化（省编码时间），强制 4:2:0 并降低色度质量"""
+        # 注意 IMWRITE_JPEG_OPTIMIZE 需传 0/1 而非 bool
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality, cv2.IMWRITE_JPEG_OPTIMIZE, 0]
+        # 旧版 OpenCV 没有以下参数
+        if hasattr(cv2, 'IMWRITE_JPEG_CHROMA_QUALITY'):
+            params += [cv2.IMWRITE_JPEG_CHROMA_QUALITY, max(10, quality - 10)]
+        if hasattr(cv2, 'IMWRITE_JPEG_SAMPLING_FACTOR'):
+            params += [cv2.IMWRITE_JPEG_SAMPLING_FACTOR, cv2.IMWRITE_JPEG_SAMPLING_FACTOR_420]
+        return params
+
+    def _downscale(self, img_bgr, size):
+        """缩放到目标分辨率；OpenCL 可用时在设备端完成，只取回小图。输入可为 BGR 或 BGRA，输出总是 BGR"""
+        if self._use_opencl:
+            small = cv2.resize(cv2.UMat(img_bgr), size, interpolation=cv2.INTER_AREA).get()
+        else:
+            small = cv2.resize(img_bgr, size, interpolation=cv2.INTER_AREA)
+        if small.shape[2] == 4:
+            small = cv2.cvtColor(small, cv2.COLOR_BGRA2BGR)
+        return small
+
+    def _send_frame(self, video_sock, format_prefix, encoded_data):
+        """发送一帧并更新带宽/帧率统计"""
+        try:
+            # copy=False: 大于 zmq.COPY_THRESHOLD 的帧直接引用缓冲区
+            video_sock.send_multipart([format_prefix, encoded_data], copy=False)
+
+            # 带宽统计
+            now = time.time()
+            if now - self.last_time > 1.0:
+                mbps = (self.last_bytes * 8) / (1e6 * (now - self.last_time))
+                self.bandwidth_update.emit(mbps)
+                self.last_bytes = 0
+                self.last_time = now
+            self.last_bytes += len(encoded_data)
+
+            # 发送帧率统计
+            self.frame_count += 1
+            if time.time() - self.frame_start_time >= 1.0:
+                send_fps = self.frame_count / (time.time() - self.frame_start_time)
+                self.send_fps_update.emit(send_fps)
+                self.frame_count = 0
+                self.frame_start_time = time.time()
+
+        except zmq.Again:
+            pass
+
+    def _offer_frame(self, item):
+        """交给发送线程；槽位已满时丢弃未处理的旧帧（只有捕获线程一个生产者）"""
+        try:
+            self._send_queue.put_nowait(item)
+        except queue.Full:
+            try:
+                self._send_queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._send_queue.put_nowait(item)
+
+    def _send_loop(self):
+        """编码发送线程：ZMQ 套接字只在本线程内使用"""
         zmq_ctx = zmq.Context()
         video_sock = zmq_ctx.socket(zmq.PUB)
         video_sock.setsockopt(zmq.SNDHWM, 2)
@@ -268,46 +602,161 @@ class CaptureWorker(QObject):
         video_sock.setsockopt(zmq.CURVE_SECRETKEY, self.zmq_secret_key) # 设置服务器私钥
 
         bind_address = f"tcp://*:{self.config_mgr.config['zmq_port']}"
-        video_sock.bind(bind_address)
+        try:
+            video_sock.bind(bind_address)
+        except zmq.ZMQError as e:
+            # 端口被占用等情况下发送线程无法工作，同时停止捕获线程，避免空转
+            logger.error(f"ZMQ PUB socket bind to {bind_address} failed: {e}")
+            self.status_update.emit(f"错误: 端口绑定失败 {bind_address}: {e}")
+            self.running = False
+            video_sock.close(linger=0)
+            zmq_ctx.term()
+            return
         logger.info(f"ZMQ PUB socket bound to {bind_address} with Curve encryption enabled.")
 
-        next_frame_time = time.perf_counter()
-
         while self.running:
-            current_config_fps = self.config_mgr.config['target_fps']
-            if current_config_fps != self.current_fps:
-                self.current_fps = current_config_fps
-                self.target_interval = 1.0 / self.current_fps
-                logger.info(f"帧率已更新为: {self.current_fps} FPS")
+            try:
+                small_bgr = self._send_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
 
-            current_time = time.perf_counter()
-            sleep_time = next_frame_time - current_time
-            if sleep_time > 0:
-                time.sleep(max(sleep_time, 0.001))
+            try:
+                if small_bgr is None:
+                    # 画面无变化时的定期重发；捕获线程切换显示器时会清空 last_payload，只读取一次
+                    payload = self.last_payload
+                    if payload is not None:
+                        self._send_frame(video_sock, *payload)
+                    continue
+
+                format_prefix, encode = self._encoder
+                success, encoded_data = encode(small_bgr)
+
+                if success:
+                    # cv2 的编码结果是 ndarray，直接以缓冲区发送，不再 tobytes() 复制
+                    payload = (format_prefix, encoded_data)
+                    self.last_payload = payload
+                    self._send_frame(video_sock, *payload)
+            except Exception as e:
+                self.status_update.emit(f"错误: {str(e)}")
 
-            next_frame_time += self.target_interval
+        video_sock.close(linger=0)
+        zmq_ctx.term()
 
-            with self.capture_lock:
-                should_capture = self.capture_enabled or self.conn_checker.get_connected_count() > 0
-                should_send = self.conn_checker.get_connected_count() > 0
-                monitor_idx = self.current_monitor or self.config_mgr.config['monitor_idx']
+    def _worker_loop(self):
+        """捕获线程：按目标帧率捕获、绘制指针、缩放，需发送的帧交给发送线程"""
+        # 有可用 OpenCL 设备（核显）时缩放走 UMat
+        self._use_opencl = cv2.ocl.haveOpenCL()
+        cv2.ocl.setUseOpenCL(self._use_opencl)
+        logger.info(f"OpenCL 缩放: {'启用' if self._use_opencl else '不可用'}")
+
+        # 默认 15.6ms 的定时器粒度无法满足 60 FPS 的节拍，捕获期间临时改为 1ms
+        _winmm.timeBeginPeriod(TIMER_RESOLUTION_MS)
+        self._sct = None
+        opened_cameras = []
+        # 初始化或循环中任何异常退出都必须配对 timeEndPeriod 并释放捕获对象
+        try:
+            next_frame_time = time.perf_counter()
+            # 捕获对象只在显示器切换时重建，不再每帧创建
+            # mss 实例与线程绑定，须在本线程内创建
+            self._sct = mss.mss()
+            active_monitor = None
+            monitors = []
+            camera = None
+            # 显示器 -> DXGI 捕获对象，None 表示该显示器使用 mss；对象只在线程退出时释放
+            cameras = {}
+            verified_cameras = set() # 已确认 DXGI 输出与 mss 显示器对应的显示器编号
+            # DXGI 只在画面变化时返回新帧，保留最近一帧缩小图供新订阅者和定期重发使用
+            last_dxgi_frame = None
+            was_sending = False
+
+            while self.running:
+                # 每帧取一次配置快照，避免界面修改导致同一帧内参数不一致
+                cfg = self.config_mgr.config.copy()
+                current_config_fps = cfg['target_fps']
+                if current_config_fps != self.current_fps:
+                    self.current_fps = current_config_fps
+                    self.target_interval = 1.0 / self.current_fps
+                    logger.info(f"帧率已更新为: {self.current_fps} FPS")
+
+                # 先 sleep 到截止前约 1ms，剩余部分忙等，避免 sleep 粒度造成的系统性欠帧
+                remaining = next_frame_time - time.perf_counter()
+                if remaining > 0.002:
+                    time.sleep(remaining - 0.001)
+                while time.perf_counter() < next_frame_time:
+                    pass
 
-            if not should_capture and not should_send:
-                continue
+                next_frame_time += self.target_interval
 
-            try:
-                with mss.mss() as sct:
-                    monitors = sct.monitors
-                    if monitor_idx >= len(monitors):
-                        self.status_update.emit("错误: 显示器索引无效")
-                        continue
+                with self.capture_lock:
+                    should_capture = self.capture_enabled or self.conn_checker.get_connected_count() > 0
+                    should_send = self.conn_checker.get_connected_count() > 0
+                    monitor_idx = self.current_monitor or cfg['monitor_idx']
+                # 订阅者刚出现时立即发送当前画面，不等画面变化
+                send_started = should_send and not was_sending
+                was_sending = should_send
+
+                if not should_capture and not should_send:
+                    # 无预览且无订阅者时低频轮询，并重置节拍，避免唤醒后连续补帧
+                    time.sleep(0.25)
+                    next_frame_time = time.perf_counter() + self.target_interval
+                    continue
+
+                try:
+                    if monitor_idx != active_monitor:
+                        # mss 会缓存显示器列表，切换显示器时重建实例以获取最新布局
+                        self._sct.close()
+                        self._sct = mss.mss()
+                        monitors = self._sct.monitors
+                        if monitor_idx >= len(monitors):
+                            self.status_update.emit("错误: 显示器索引无效")
+                            continue
+                        if monitor_idx not in cameras:
+                            cameras[monitor_idx] = self._open_dxcam(monitor_idx)
+                            if cameras[monitor_idx] is not None:
+                                opened_cameras.append(cameras[monitor_idx])
+                        camera = cameras[monitor_idx]
+                        active_monitor = monitor_idx
+                        self.last_frame_hash = None
+                        self.last_payload = None
+                        last_dxgi_frame = None
+                        backend = "DXGI" if camera is not None else "GDI"
+                        logger.info(f"显示器 {monitor_idx} 捕获后端: {backend}")
+                        self.status_update.emit(f"状态: 捕获后端 {backend}")
 
                     mon = monitors[monitor_idx]
-                    screenshot = sct.grab(mon)
-                    img_rgb = np.frombuffer(screenshot.rgb, dtype=np.uint8).reshape(
-                        (mon["height"], mon["width"], 3)
-                    )
-                    img_bgr = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2BGR)
+                    if camera is not None:
+                        # DXGI 只在画面（含指针）变化时返回新帧
+                        try:
+                            img_bgr = camera.grab()
+                        except Exception as e:
+                            # DXGI 访问丢失（如切换到安全桌面）后该显示器改用 mss，不再重建捕获对象
+                            logger.warning(f"DXGI 捕获失败，显示器 {monitor_idx} 改用 GDI: {e}")
+                            cameras[monitor_idx] = camera = None
+                            self.status_update.emit("状态: 捕获后端 GDI")
+                            continue
+                        if img_bgr is None:
+                            if should_send and last_dxgi_frame is not None:
+                                self.frame_skip_count += 1
+                                # 新订阅者立即发送；画面静止时每10帧用最近一帧强制发送一次
+                                if send_started or self.frame_skip_count >= 10:
+                                    self.frame_skip_count = 0
+                                    self._offer_frame(last_dxgi_frame)
+                            continue
+                        if monitor_idx not in verified_cameras:
+                            # mss 与 dxcam 的显示器顺序来源不同，首帧确认对应关系，不一致时改用 mss
+                            if not self._dxcam_matches(camera, mon, img_bgr):
+                                logger.warning(f"DXGI 输出与显示器 {monitor_idx} 不对应，改用 GDI")
+                                cameras[monitor_idx] = camera = None
+                                self.status_update.emit("状态: 捕获后端 GDI")
+                                continue
+                            verified_cameras.add(monitor_idx)
+                    else:
+                        screenshot = self._sct.grab(mon)
+                        # 直接使用 mss 原生的 BGRA 数据（.rgb 属性是在 Python 中逐像素重排生成的）
+                        # 整帧保持 4 通道，绘制指针和缩放都在 BGRA 上进行，只对缩小后的小图去掉 alpha
+                        img_bgr = np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(
+                            (mon["height"], mon["width"], 4)
+                        )
 
                     # 绘制鼠标指针
                     mx, my = self.get_mouse_pos()
@@ -316,84 +765,79 @@ class CaptureWorker(QObject):
                     if 0 <= mouse_x < mon["width"] and 0 <= mouse_y < mon["height"]:
                         img_bgr = self.draw_mouse_cursor(img_bgr, mouse_x, mouse_y)
 
+                    # 缩放后的小图同时用于网络发送和预览
+                    small_bgr = self._downscale(img_bgr, cfg['target_resolution'])
+                    if camera is not None:
+                        last_dxgi_frame = small_bgr
+
                     # 网络发送
                     if should_send:
-                        # 帧变化检测
-                        frame_hash = hash(img_bgr.tobytes())
                         should_send_frame = True
-
-                        if frame_hash == self.last_frame_hash:
-                            self.frame_skip_count += 1
-                            should_send_frame = False
-                        else:
-                            self.last_frame_hash = frame_hash
+                        if camera is not None:
+                            # DXGI 已完成变化检测
                             self.frame_skip_count = 0
+                        else:
+                            # 帧变化检测：只对缩小后的帧做校验，避免整帧 tobytes() 拷贝
+                            frame_hash = zlib.crc32(small_bgr)
 
-                        # 每10帧强制发送一次
-                        if self.frame_skip_count >= 10:
-                            should_send_frame = True
-                            self.frame_skip_count = 0
+                            if frame_hash == self.last_frame_hash:
+                                self.frame_skip_count += 1
+                                should_send_frame = False
+                            else:
+                                self.last_frame_hash = frame_hash
+                                self.frame_skip_count = 0
+
+                            # 每10帧或新订阅者出现时强制发送一次
+                            if send_started or self.frame_skip_count >= 10:
+                                should_send_frame = True
+                                self.frame_skip_count = 0
 
                         if should_send_frame:
-                            small_bgr = cv2.resize(img_bgr, self.config_mgr.config['target_resolution'], interpolation=cv2.INTER_AREA)
-
-                            encoding_format = self.config_mgr.config['encoding_format']
-                            if encoding_format == 'jpg':
-                                quality = self.config_mgr.config['jpeg_quality'] * 10
-                                success, encoded_data = cv2.imencode('.jpg', small_bgr, [cv2.IMWRITE_JPEG_QUALITY, quality])
-                            elif encoding_format == 'png':
-                                compression = self.config_mgr.config['png_compression']
-                                success, encoded_data = cv2.imencode('.png', small_bgr, [cv2.IMWRITE_PNG_COMPRESSION, compression])
-                            elif encoding_format == 'webp':
-                                quality = self.config_mgr.config['webp_quality'] * 10
-                                success, encoded_data = cv2.imencode('.webp', small_bgr, [cv2.IMWRITE_WEBP_QUALITY, quality])
-                            else:
-                                quality = self.config_mgr.config['jpeg_quality'] * 10
-                                success, encoded_data = cv2.imencode('.jpg', small_bgr, [cv2.IMWRITE_JPEG_QUALITY, quality])
-
-                            if success:
-                                try:
-                                    format_prefix = encoding_format.encode()
-                                    video_sock.send_multipart([format_prefix, encoded_data.tobytes()])
-
-                                    # 带宽统计
-                                    now = time.time()
-                                    if now - self.last_time > 1.0:
-                                        mbps = (self.last_bytes * 8) / (1e6 * (now - self.last_time))
-                                        self.bandwidth_update.emit(mbps)
-                                        self.last_bytes = 0
-                                        self.last_time = now
-                                    self.last_bytes += len(encoded_data)
-
-                                    # 发送帧率统计
-                                    self.frame_count += 1
-                                    if time.time() - self.frame_start_time >= 1.0:
-                                        send_fps = self.frame_count / (time.time() - self.frame_start_time)
-                                        self.send_fps_update.emit(send_fps)
-                                        self.frame_count = 0
-                                        self.frame_start_time = time.time()
-
-                                except zmq.Again:
-                                    pass
-
-                    # 发送帧（用于预览和网络）
-                    self.frame_ready.emit(img_bgr.copy())
+                            # 编码与发送在另一线程进行（cv2 编码释放 GIL），与下一帧捕获重叠
+                            self._offer_frame(small_bgr)
+
+                    # 预览直接使用目标分辨率的小图：它是 resize 新分配的，不与下一帧共享缓冲区，无需整帧 copy()
+                    self.frame_ready.emit(small_bgr)
 
                     if should_send:
                         self.status_update.emit("状态: 捕获中")
 
-            except Exception as e:
-                self.status_update.emit(f"错误: {str(e)}")
-
-        zmq_ctx.term()
+                except Exception as e:
+                    self.status_update.emit(f"错误: {str(e)}")
+        finally:
+            for cam in opened_cameras:
+                try:
+                    cam.release()
+                except Exception as e:
+                    logger.warning(f"释放 DXGI 捕获对象失败: {e}")
+            if self._sct is not None:
+                self._sct.close()
+                self._sct = None
+            _winmm.timeEndPeriod(TIMER_RESOLUTION_MS)
 
     def get_mouse_pos(self):
-        class POINT(ctypes.Structure):
-            _fields_ = [("x", wintypes.LONG), ("y", wintypes.LONG)]
-        pt = POINT()
-        ctypes.windll.user32.GetCursorPos(ctypes.byref(pt))
+        pt = self._pt
+        _GetCursorPos(ctypes.byref(pt))
         return pt.x, pt.y
 
+    def _cursor_template(self, cursor_size):
+        """按尺寸缓存鼠标指针多边形（相对坐标）及其外接范围"""
+        cached = self._cursor_templates.get(cursor_size)
+        if cached is None:
+            # 定义鼠标指针的点集 (经典的箭头形状)
+            points = np.array([
+                [0, 0],      # 尖端
+                [cursor_size//2, cursor_size],   # 右侧转折
+                [cursor_size//4, cursor_size],   # 中间转折
+                [cursor_size//4, cursor_size*2], # 底部
+                [0, cursor_size*2],              # 底部尖端
+                [-cursor_size//4, cursor_size],  # 左侧转折
+                [-cursor_size//2, cursor_size],  # 左侧
+            ], dtype=np.int32)
+            cached = (points, points.min(axis=0), points.max(axis=0))
+            self._cursor_templates[cursor_size] = cached
+        return cached
+
     def draw_mouse_cursor(self, img, x, y):
         """
         在图像上绘制鼠标指针
@@ -409,33 +853,20 @@ class CaptureWorker(QObject):
         h, w = img.shape[:2]
         base_size = min(w, h) // 50  # 基础大小约为图像宽度/100
         cursor_size = max(16, base_size)  # 最小8像素
-        
-        # 定义鼠标指针的点集 (经典的箭头形状)
-        # 使用相对坐标，然后按实际位置进行偏移
-        points = np.array([
-            [0, 0],      # 尖端
-            [cursor_size//2, cursor_size],   # 右侧转折
-            [cursor_size//4, cursor_size],   # 中间转折
-            [cursor_size//4, cursor_size*2], # 底部
-            [0, cursor_size*2],              # 底部尖端
-            [-cursor_size//4, cursor_size],  # 左侧转折
-            [-cursor_size//2, cursor_size],  # 左侧
-        ], dtype=np.int32)
-        
-        # 将相对坐标转换为绝对坐标
-        points[:, 0] += x
-        points[:, 1] += y
+        template, lo, hi = self._cursor_template(cursor_size)
         
         # 检查是否超出边界
-        if (points[:, 0].min() < 0 or points[:, 0].max() >= w or 
-            points[:, 1].min() < 0 or points[:, 1].max() >= h):
+        if (x + lo[0] < 0 or x + hi[0] >= w or
+            y + lo[1] < 0 or y + hi[1] >= h):
             return img  # 如果超出边界则不绘制
         
-        # 计算区域平均亮度以确定颜色
-        roi_size = min(cursor_size * 3, x, y, w-x, h-y)
-        if roi_size > 0:
-            roi = img[max(0, y-roi_size):min(h, y+roi_size), max(0, x-roi_size):min(w, x+roi_size)]
-            avg_brightness = np.mean(roi)
+        # 将相对坐标转换为绝对坐标（一次广播加法）
+        points = template + (x, y)
+        
+        # 亮度是低频量，取指针尖端附近 8x8 区域即可决定颜色
+        roi = img[max(0, y-4):y+4, max(0, x-4):x+4]
+        if roi.size:
+            avg_brightness = sum(cv2.mean(roi)[:3]) / 3
             color = (0, 0, 0) if avg_brightness > 128 else (255, 255, 255)
         else:
             color = (255, 255, 255)
@@ -468,25 +899,34 @@ class PreviewLabel(QLabel):
         if label_w <= 0 or label_h <= 0:
             return
 
-        scale = min(label_w / w, label_h / h)
-        new_w = int(w * scale)
-        new_h = int(h * scale)
-
-        resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
-        bytes_per_line = 3 * new_w
-        qimg = QImage(resized.data, new_w, new_h, bytes_per_line, QImage.Format.Format_BGR888)
-        pixmap = QPixmap.fromImage(qimg)
+        # QImage 直接引用 numpy 缓冲区，fromImage 时才复制一次；缩放交给 Qt 完成
+        qimg = QImage(frame.data, w, h, frame.strides[0], QImage.Format.Format_BGR888)
+        pixmap = QPixmap.fromImage(qimg).scaled(
+            label_w, label_h,
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation
+        )
         self.setPixmap(pixmap)
 
 class MainWindow(QMainWindow):
-    def __init__(self, silent_mode=False, startup_delay=0):
+    def __init__(self, silent_mode=False, startup_delay=0, app_icon=None):
         super().__init__()
         self.config_mgr = ConfigManager()
         self.silent_mode = silent_mode
         self.startup_delay = startup_delay
-
-        # 设置窗口图标（与托盘相同）
-        self.set_window_icon()
+        self._is_frozen = IS_FROZEN
+        self._exe_path = self.get_current_exe_path()
+        # 开机自启命令（带5秒延迟）只依赖可执行文件路径
+        self._autostart_command = f'"{self._exe_path}" --silent 5'
+        self._not_frozen_warning = None
+        # 自启状态缓存，Run 键变化通知注册成功后才启用
+        self._autostart_cached = None
+        self._run_watch_key = None
+        self._run_watch_event = None
+        self._run_key_notifier = None
+
+        # 设置窗口图标（与托盘相同），解析结果保存在 self._app_icon
+        self.set_window_icon(app_icon)
         self.setWindowTitle("Display Stream Server")
         self.setMinimumSize(500, 700)
 
@@ -604,7 +1044,6 @@ class MainWindow(QMainWindow):
 
         # 连接检测器
         self.conn_checker = ConnectionChecker(self.config_mgr)
-        self.conn_checker.start_checking()
 
         # 工作线程
         self.worker = CaptureWorker(self.config_mgr, self.conn_checker)
@@ -612,16 +1051,14 @@ class MainWindow(QMainWindow):
         self.worker.status_update.connect(self.update_status)
         self.worker.bandwidth_update.connect(self.update_bandwidth)
         self.worker.send_fps_update.connect(self.update_send_fps)
-        self.worker.start_worker()
 
         # 连接状态定时器
         self.conn_timer = QTimer()
         self.conn_timer.timeout.connect(self.update_connection_status)
-        self.conn_timer.start(2000)
 
-        # 初始状态
-        self.capture_active = True
-        self.worker.set_capture_state(True)
+        # 初始状态：窗口可见且启用预览时才需要本地捕获，由 showEvent 开启
+        self.capture_active = False
+        self.worker.set_capture_state(False)
 
         # 检查自启状态
         self.check_autostart_status()
@@ -632,7 +1069,20 @@ class MainWindow(QMainWindow):
 
         # 更新 UI 可见性
         self.update_encoding_ui_visibility()
+        self.update_png_warning()
+        self.config_mgr.config_changed.connect(self.update_png_warning)
 
+        # 后台线程延迟启动，事件循环和托盘图标先行就绪（开机自启时不再阻塞等待）
+        if self.startup_delay > 0:
+            logger.info(f"等待 {self.startup_delay} 秒后启动...")
+            self.status_label.setText("状态: 等待启动")
+        QTimer.singleShot(self.startup_delay * 1000, self._deferred_start)
+
+    def _deferred_start(self):
+        """启动连接检测、捕获线程和连接状态定时器"""
+        self.conn_checker.start_checking()
+        self.worker.start_worker()
+        self.conn_timer.start(2000)
         self.status_label.setText("状态: 监听中")
 
     def update_encoding_ui_visibility(self):
@@ -658,6 +1108,24 @@ class MainWindow(QMainWindow):
             self.webp_label.setVisible(True)
             self.webp_quality_spin.setVisible(True)
 
+    def update_png_warning(self, key=None):
+        """PNG 压缩级别过高且帧率较高时提示实际编码使用的级别"""
+        cfg = self.config_mgr.config
+        limited = (cfg['encoding_format'] == 'png'
+                   and cfg['png_compression'] > PNG_STREAM_MAX_COMPRESSION
+                   and cfg['target_fps'] > PNG_STREAM_FPS_LIMIT)
+        if limited:
+            self.png_label.setText(f"PNG压缩(0-9, 实际≤{PNG_STREAM_MAX_COMPRESSION}):")
+            self.png_label.setStyleSheet("color: #d9534f;")
+            self.png_label.setToolTip(
+                f"目标帧率高于 {PNG_STREAM_FPS_LIMIT} FPS 时 PNG 编码无法跟上，"
+                f"压缩级别按 {PNG_STREAM_MAX_COMPRESSION} 处理；建议改用 JPG 或 WebP"
+            )
+        else:
+            self.png_label.setText("PNG压缩(0-9):")
+            self.png_label.setStyleSheet("")
+            self.png_label.setToolTip("")
+
     def on_encoding_changed(self, encoding):
         """编码格式改变"""
         self.config_mgr.update_and_save('encoding_format', encoding)
@@ -685,11 +1153,10 @@ class MainWindow(QMainWindow):
             text = f"连接: 无 | 带宽: -- Mbps | 发送: {self.current_send_fps} FPS"
         self.conn_bandwidth_label.setText(text)
 
-    def set_window_icon(self):
-        """设置窗口图标（与托盘相同）"""
-        icon = QIcon.fromTheme("video-display")
-        if icon.isNull():
-            icon = QIcon.fromTheme("computer")
+    def set_window_icon(self, icon=None):
+        """设置窗口图标（与托盘相同），icon 为 main() 中已解析的应用图标"""
+        if icon is None:
+            icon = _get_app_icon()
         if icon.isNull():
             icon = QIcon.fromTheme("application-x-executable")
         if icon.isNull():
@@ -712,6 +1179,7 @@ class MainWindow(QMainWindow):
             except:
                 icon = QIcon()
 
+        self._app_icon = icon
         self.setWindowIcon(icon)
 
     def setup_tray(self):
@@ -724,6 +1192,10 @@ class MainWindow(QMainWindow):
         """托盘点击事件"""
         if reason == QSystemTrayIcon.ActivationReason.DoubleClick:
             self.show_window()
+        elif reason == QSystemTrayIcon.ActivationReason.Context and self.tray_menu is None:
+            # 首次右键：创建菜单并手动弹出，之后由 Qt 负责显示
+            self._build_tray_menu()
+            self.tray_menu.popup(QCursor.pos())
 
     def resizeEvent(self, event):
         if hasattr(self, '_current_frame') and self.preview_checkbox.isChecked():
@@ -742,11 +1214,38 @@ class MainWindow(QMainWindow):
         else:
             self.update_status("状态: 监听中")
             self.preview_label.clear()
+        self.update_capture_state()
+
+    def update_capture_state(self, monitor_idx=None):
+        """本地捕获只在预览启用且窗口可见时开启；有订阅者时工作线程自行捕获"""
+        if not hasattr(self, 'worker'):
+            return
+        capture = self.preview_checkbox.isChecked() and self.isVisible()
+        # 状态未变且无需切换显示器时不再通知工作线程
+        if capture == self.capture_active and monitor_idx is None:
+            return
+        self.capture_active = capture
+        self.worker.set_capture_state(capture, monitor_idx)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_capture_state()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        if not event.spontaneous():
+            # 隐藏到托盘时禁用预览（最小化属于系统发起的隐藏，保留预览设置）
+            # 有网络连接时工作线程仍会捕获；已处于目标状态时跳过，避免多余的信号与重绘
+            if self.preview_checkbox.isChecked():
+                self.preview_checkbox.setChecked(False)
+            if not self.preview_label.pixmap().isNull():
+                self.preview_label.clear()
+        self.update_capture_state()
 
     def on_monitor_changed(self):
         monitor_idx = self.monitor_combo.currentData()
         self.config_mgr.update_and_save('monitor_idx', monitor_idx)
-        self.worker.set_capture_state(self.capture_active, monitor_idx)
+        self.update_capture_state(monitor_idx)
 
     def update_status(self, text):
         self.status_label.setText(text)
@@ -775,60 +1274,39 @@ class MainWindow(QMainWindow):
             self.monitor_combo.setCurrentIndex(saved_idx - 1)
 
     def get_current_exe_path(self):
-        """获取当前执行文件的正确路径"""
-        if getattr(sys, 'frozen', False):
-            # PyInstaller 打包后的路径
-            return sys.executable
-        else:
-            # 开发模式：返回当前脚本路径
-            return os.path.abspath(__file__)
+        """获取当前执行文件的正确路径（打包版本为 exe，开发模式为脚本）"""
+        return EXE_PATH
 
-    def validate_autostart_path(self):
-        """验证并修复自启路径（在启动时调用）"""
+    def validate_autostart_path(self, key):
+        """验证并修复自启路径（在启动时调用），key 为已以读写权限打开的 Run 键"""
+        if not self._is_frozen:
+            return
         try:
-            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER,
-                            r"Software\Microsoft\Windows\CurrentVersion\Run",
-                            0, winreg.KEY_READ)
-            try:
-                stored_path, _ = winreg.QueryValueEx(key, "VirtualDisplaySender")
-                current_path = self.get_current_exe_path()
-
-                # 检查存储的路径是否还有效
-                stored_exe = stored_path.strip('"').split()[0]  # 移除引号并取第一个参数
-
-                if stored_exe != current_path and os.path.exists(current_path):
-                    # 路径已改变，更新注册表
-                    logger.info(f"检测到路径变化: {stored_exe} -> {current_path}")
-
-                    # 重新设置正确的路径
-                    winreg.CloseKey(key)
-                    key = winreg.OpenKey(winreg.HKEY_CURRENT_USER,
-                                    r"Software\Microsoft\Windows\CurrentVersion\Run",
-                                    0, winreg.KEY_WRITE)
-
-                    new_command = f'"{current_path}" --silent 5'
-                    winreg.SetValueEx(key, "VirtualDisplaySender", 0, winreg.REG_SZ, new_command)
-                    logger.info(f"自启路径已更新: {new_command}")
-
-            except FileNotFoundError:
-                # 没有设置自启，无需处理
-                pass
-            finally:
-                winreg.CloseKey(key)
+            stored_path, _ = winreg.QueryValueEx(key, "VirtualDisplaySender")
+        except FileNotFoundError:
+            # 没有设置自启，无需处理
+            return
+        try:
+            # 与缓存的期望命令直接比较（Windows 路径不区分大小写），不一致时重写
+            if stored_path.casefold() != self._autostart_command.casefold():
+                logger.info(f"检测到路径变化: {stored_path} -> {self._autostart_command}")
+                winreg.SetValueEx(key, "VirtualDisplaySender", 0, winreg.REG_SZ, self._autostart_command)
+                logger.info(f"自启路径已更新: {self._autostart_command}")
         except Exception as e:
             logger.error(f"验证自启路径失败: {e}")
 
     def toggle_autostart(self, state):
         """切换开机自启（带5秒延迟）"""
         # 检查是否为打包版本
-        if state == Qt.CheckState.Checked.value and not getattr(sys, 'frozen', False):
-            # 不是打包版本，报错并不设置自启
-            from PyQt6.QtWidgets import QMessageBox
-            msg_box = QMessageBox()
-            msg_box.setIcon(QMessageBox.Icon.Warning)
-            msg_box.setWindowTitle("警告")
-            msg_box.setText("只有打包的EXE版本才支持开机自启功能。")
-            msg_box.exec()
+        if state == Qt.CheckState.Checked.value and not self._is_frozen:
+            # 不是打包版本，报错并不设置自启；对话框首次使用时创建，之后复用
+            if self._not_frozen_warning is None:
+                msg_box = QMessageBox(self)
+                msg_box.setIcon(QMessageBox.Icon.Warning)
+                msg_box.setWindowTitle("警告")
+                msg_box.setText("只有打包的EXE版本才支持开机自启功能。")
+                self._not_frozen_warning = msg_box
+            self._not_frozen_warning.exec()
             
             # 取消勾选
             self.autostart_checkbox.blockSignals(True)
@@ -837,24 +1315,17 @@ class MainWindow(QMainWindow):
             return
 
         try:
-            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER,
-                            r"Software\Microsoft\Windows\CurrentVersion\Run",
-                            0, winreg.KEY_WRITE)
-
-            current_exe_path = self.get_current_exe_path()
-
             if state == Qt.CheckState.Checked.value:
-                # 开机自启带5秒延迟
-                command = f'"{current_exe_path}" --silent 5'
-                winreg.SetValueEx(key, "VirtualDisplaySender", 0, winreg.REG_SZ, command)
-                logger.info(f"开机自启已启用: {command}")
+                set_run_value("VirtualDisplaySender", self._autostart_command)
+                logger.info(f"开机自启已启用: {self._autostart_command}")
             else:
                 try:
-                    winreg.DeleteValue(key, "VirtualDisplaySender")
+                    delete_run_value("VirtualDisplaySender")
                     logger.info("开机自启已禁用")
                 except FileNotFoundError:
                     pass
-            winreg.CloseKey(key)
+            if self._run_key_notifier is not None:
+                self._autostart_cached = state == Qt.CheckState.Checked.value
         except Exception as e:
             logger.error(f"设置开机自启失败: {e}")
             self.autostart_checkbox.blockSignals(True)
@@ -862,92 +1333,138 @@ class MainWindow(QMainWindow):
             self.autostart_checkbox.blockSignals(False)
 
     def check_autostart_status(self):
-        """检查当前开机自启状态"""
-        # 先验证路径
-        self.validate_autostart_path()
+        """检查当前开机自启状态；注册表变化通知生效后直接返回缓存值"""
+        if self._run_key_notifier is not None and self._autostart_cached is not None:
+            self.autostart_checkbox.setChecked(self._autostart_cached)
+            return self._autostart_cached
 
+        enabled = False
         try:
-            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER,
-                            r"Software\Microsoft\Windows\CurrentVersion\Run",
-                            0, winreg.KEY_READ)
+            # 如果当前不是打包版本，无需验证和读取，直接尝试移除自启项
+            if not self._is_frozen:
+                try:
+                    delete_run_value("VirtualDisplaySender")
+                    logger.info("已移除开机自启项（非EXE版本）")
+                except FileNotFoundError:
+                    pass
+            else:
+                enabled = self._read_autostart(validate=True)
+                self._autostart_cached = enabled
+                self._start_run_key_watch()
+        except Exception as e:
+            logger.error(f"检查自启状态失败: {e}")
+        self.autostart_checkbox.setChecked(enabled)
+        return enabled
+
+    def _read_autostart(self, validate=False):
+        """读取 Run 键中是否存在自启项；validate 为 True 时先修正路径"""
+        # Run 键只打开一次，验证、读取共用同一句柄
+        with open_run_key(winreg.KEY_READ | winreg.KEY_WRITE) as key:
+            if validate:
+                self.validate_autostart_path(key)
             try:
-                value, _ = winreg.QueryValueEx(key, "VirtualDisplaySender")
-                
-                # 如果当前不是打包版本，直接移除自启项
-                if not getattr(sys, 'frozen', False):
-                    winreg.CloseKey(key)
-                    # 以写权限重新打开并删除
-                    key_write = winreg.OpenKey(winreg.HKEY_CURRENT_USER,
-                                    r"Software\Microsoft\Windows\CurrentVersion\Run",
-                                    0, winreg.KEY_WRITE)
-                    try:
-                        winreg.DeleteValue(key_write, "VirtualDisplaySender")
-                        logger.info("已移除开机自启项（非EXE版本）")
-                    except FileNotFoundError:
-                        pass
-                    winreg.CloseKey(key_write)
-                    self.autostart_checkbox.setChecked(False)
-                else:
-                    self.autostart_checkbox.setChecked(True)
-                    
+                winreg.QueryValueEx(key, "VirtualDisplaySender")
             except FileNotFoundError:
-                self.autostart_checkbox.setChecked(False)
-            finally:
-                winreg.CloseKey(key)
+                return False
+            return True
+
+    def _start_run_key_watch(self):
+        """注册 Run 键变化通知，只有注册表实际变化时才重新读取"""
+        if self._run_key_notifier is not None:
+            return
+        try:
+            self._run_watch_key = winreg.OpenKey(
+                winreg.HKEY_CURRENT_USER, RUN_PATH, 0, winreg.KEY_NOTIFY | winreg.KEY_READ
+            )
+            # 自动复位事件：每次通知触发一次 activated
+            self._run_watch_event = _CreateEventW(None, False, False, None)
+            if not self._run_watch_event:
+                raise ctypes.WinError()
+            self._arm_run_key_watch()
+            self._run_key_notifier = QWinEventNotifier(self._run_watch_event, self)
+            self._run_key_notifier.activated.connect(self._on_run_key_changed)
         except Exception as e:
-            logger.error(f"检查自启状态失败: {e}")
-            self.autostart_checkbox.setChecked(False)
+            logger.error(f"注册自启项变化通知失败，退回每次查询注册表: {e}")
+            self._stop_run_key_watch()
+
+    def _arm_run_key_watch(self):
+        """异步通知是一次性的，每次触发后都要重新注册"""
+        rc = _RegNotifyChangeKeyValue(
+            int(self._run_watch_key), False, REG_NOTIFY_CHANGE_LAST_SET, self._run_watch_event, True
+        )
+        if rc != 0:
+            raise ctypes.WinError(rc)
+
+    def _on_run_key_changed(self, *_):
+        """Run 键发生变化：重新注册通知并刷新缓存与复选框"""
+        try:
+            self._arm_run_key_watch()
+            enabled = self._read_autostart()
+        except Exception as e:
+            logger.error(f"刷新自启状态失败: {e}")
+            self._stop_run_key_watch()
+            return
+        self._autostart_cached = enabled
+        if self.autostart_checkbox.isChecked() != enabled:
+            # 外部修改只同步界面，不再回写注册表
+            self.autostart_checkbox.blockSignals(True)
+            self.autostart_checkbox.setChecked(enabled)
+            self.autostart_checkbox.blockSignals(False)
+
+    def _stop_run_key_watch(self):
+        """释放通知相关的句柄，缓存随之失效"""
+        if self._run_key_notifier is not None:
+            self._run_key_notifier.setEnabled(False)
+            self._run_key_notifier = None
+        if self._run_watch_key is not None:
+            winreg.CloseKey(self._run_watch_key)
+            self._run_watch_key = None
+        if self._run_watch_event:
+            ctypes.windll.kernel32.CloseHandle(wintypes.HANDLE(self._run_watch_event))
+            self._run_watch_event = None
+        self._autostart_cached = None
 
     def create_tray_icon(self):
         """创建托盘图标（使用与窗口相同的图标）"""
+        if getattr(self, 'tray_icon', None) is not None:
+            return # 托盘与菜单只创建一次
+
         self.tray_icon = QSystemTrayIcon(self)
 
-        window_icon = self.windowIcon()
-        if not window_icon.isNull():
-            self.tray_icon.setIcon(window_icon)
-        else:
-            icon = QIcon.fromTheme("video-display")
-            if icon.isNull():
-                icon = QIcon.fromTheme("computer")
-            self.tray_icon.setIcon(icon)
+        self.tray_icon.setIcon(self._app_icon)
+        # 菜单在第一次右键托盘时才创建，见 on_tray_activated
+        self.tray_menu = None
 
-        # 创建菜单
-        menu = QMenu()
+    def _build_tray_menu(self):
+        """创建托盘菜单；setContextMenu 不接管所有权，需保留引用"""
+        self.tray_menu = QMenu(self)
         show_action = QAction("显示窗口", self)
         show_action.triggered.connect(self.show_window)
         quit_action = QAction("退出", self)
         quit_action.triggered.connect(self.quit_app)
-        menu.addAction(show_action)
-        menu.addAction(quit_action)
-        self.tray_icon.setContextMenu(menu)
+        self.tray_menu.addAction(show_action)
+        self.tray_menu.addAction(quit_action)
+        self.tray_icon.setContextMenu(self.tray_menu)
 
     def show_window(self):
         """显示窗口"""
         self.showNormal()
         self.raise_()
         self.activateWindow()
-        # 窗口显示时启用捕获
-        self.capture_active = True
-        self.worker.set_capture_state(True)
 
     def closeEvent(self, event):
-        """窗口关闭事件"""
-        event.ignore()  # 隐藏窗口到托盘
+        """窗口关闭事件：隐藏到托盘，预览清理由 hideEvent 完成"""
         self.hide()
-        # 窗口隐藏时禁用预览，但仍保持捕获（如果网络连接存在）
-        self.preview_checkbox.setChecked(False)
-        self.preview_label.clear()
-        # 保持网络捕获，如果存在连接
-        if self.conn_checker.get_connected_count() > 0:
-            self.worker.set_capture_state(True)
-        else:
-            self.worker.set_capture_state(False)
 
     def quit_app(self):
         """退出程序"""
         self.conn_timer.stop()
-        self.worker.stop_worker()
-        self.conn_checker.stop_checking()
+        # 先通知所有线程停止，再统一等待，总耗时取两者中较长者
+        self.worker.request_stop()
+        self.conn_checker.request_stop()
+        self.worker.wait_stopped()
+        self.conn_checker.wait_stopped()
+        self._stop_run_key_watch()
         if self.tray_icon:
             self.tray_icon.hide()
         QApplication.quit()
@@ -956,42 +1473,28 @@ def main():
     args = parse_args()
 
     # 确保工作目录正确
-    if getattr(sys, 'frozen', False):
-        # PyInstaller 打包版本
-        application_path = os.path.dirname(sys.executable)
-    else:
-        # 开发版本
-        application_path = os.path.dirname(os.path.abspath(__file__))
-    os.chdir(application_path)
+    os.chdir(APPLICATION_PATH)
 
     app = QApplication(sys.argv)
     app.setApplicationName("VirtualDisplaySender")
+    # 关闭窗口只是隐藏到托盘，退出统一走 quit_app
+    app.setQuitOnLastWindowClosed(False)
 
-    # 设置应用图标
-    window_icon = QIcon.fromTheme("video-display")
-    if window_icon.isNull():
-        window_icon = QIcon.fromTheme("computer")
-    if not window_icon.isNull():
-        app.setWindowIcon(window_icon)
+    # 设置应用图标，窗口与托盘共用同一个 QIcon
+    app_icon = _get_app_icon()
+    if not app_icon.isNull():
+        app.setWindowIcon(app_icon)
 
     # 处理启动参数
     if args.silent is not None:
-        startup_delay = args.silent
-        if startup_delay > 0:
-            logger.info(f"等待 {startup_delay} 秒后启动...")
-            time.sleep(startup_delay)
-
-        window = MainWindow(silent_mode=True, startup_delay=startup_delay)
+        startup_delay = max(args.silent, 0)
+        window = MainWindow(silent_mode=True, startup_delay=startup_delay, app_icon=app_icon)
         window.hide()  # 静默启动，只显示托盘
         window.preview_checkbox.setChecked(False)
         window.preview_label.clear()
-        if window.conn_checker.get_connected_count() > 0:
-            window.worker.set_capture_state(True)
-        else:
-            window.worker.set_capture_state(False)
         logger.info("Display Stream Server started in silent mode")
     else:
-        window = MainWindow(silent_mode=False)
+        window = MainWindow(silent_mode=False, app_icon=app_icon)
         window.show()
 
     sys.exit(app.exec())